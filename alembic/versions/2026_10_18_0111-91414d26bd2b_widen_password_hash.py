@@ -0,0 +1,37 @@
+"""widen password_hash
+
+Argon2 hashes with calibrated costs can be longer than the default ones.
+
+Revision ID: 91414d26bd2b
+Revises: 7a9c944644f8
+Create Date: 2026-10-18 01:11:10.649916+00:00
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '91414d26bd2b'
+down_revision = '7a9c944644f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        'user',
+        'password_hash',
+        type_=sa.String(length=128),
+        existing_type=sa.String(length=97),
+        existing_nullable=False,
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        'user',
+        'password_hash',
+        type_=sa.String(length=97),
+        existing_type=sa.String(length=128),
+        existing_nullable=False,
+    )
@@ -0,0 +1,37 @@
+"""api tokens
+
+Revision ID: 46fd613f0292
+Revises: 91414d26bd2b
+Create Date: 2026-10-18 01:14:09.808887+00:00
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '46fd613f0292'
+down_revision = '91414d26bd2b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'api_token',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['user_id'],
+            ['user.id'],
+        ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('digest'),
+    )
+    op.create_index(op.f('ix_api_token_user_id'), 'api_token', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_api_token_user_id'), table_name='api_token')
+    op.drop_table('api_token')
@@ -0,0 +1,40 @@
+"""missing indexes
+
+Revision ID: b6bacf98a62d
+Revises: 46fd613f0292
+Create Date: 2026-10-18 01:34:30.419886+00:00
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b6bacf98a62d'
+down_revision = '46fd613f0292'
+branch_labels = None
+depends_on = None
+
+indexes = [
+    ('issue', 'repository_id'),
+    ('issue', 'creator_id'),
+    ('repository', 'organization_id'),
+    ('user_organization', 'organization_id'),
+    ('user_repository', 'repository_id'),
+]
+
+
+def upgrade() -> None:
+    # concurrently, so that writes to the tables are not blocked while the indexes are built.
+    # That can't be done inside a transaction.
+    with op.get_context().autocommit_block():
+        for table, column in indexes:
+            name = op.f(f'ix_{table}_{column}')
+            # an interrupted concurrent build leaves an invalid index behind
+            op.execute(f'drop index concurrently if exists {name}')
+            op.create_index(name, table, [column], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column in reversed(indexes):
+            op.drop_index(
+                op.f(f'ix_{table}_{column}'), table_name=table, postgresql_concurrently=True
+            )
@@ -0,0 +1,50 @@
+"""pagination indexes
+
+Revision ID: 394c8c771246
+Revises: b6bacf98a62d
+Create Date: 2026-10-18 01:40:24.736212+00:00
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '394c8c771246'
+down_revision = 'b6bacf98a62d'
+branch_labels = None
+depends_on = None
+
+# the foreign key indexes are extended with the key of the pages of the listings,
+# so that a page is read in order instead of being sorted
+indexes = [
+    ('issue', 'repository_id', 'id'),
+    ('repository', 'organization_id', 'id'),
+    ('user_organization', 'organization_id', 'user_id'),
+    ('user_repository', 'repository_id', 'user_id'),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column, key in indexes:
+            name = op.f(f'ix_{table}_{column}_{key}')
+            # an interrupted concurrent build leaves an invalid index behind
+            op.execute(f'drop index concurrently if exists {name}')
+            op.create_index(name, table, [column, key], unique=False, postgresql_concurrently=True)
+            op.drop_index(
+                op.f(f'ix_{table}_{column}'), table_name=table, postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column, key in reversed(indexes):
+            op.execute(f'drop index concurrently if exists ix_{table}_{column}')
+            op.create_index(
+                op.f(f'ix_{table}_{column}'),
+                table,
+                [column],
+                unique=False,
+                postgresql_concurrently=True,
+            )
+            op.drop_index(
+                op.f(f'ix_{table}_{column}_{key}'), table_name=table, postgresql_concurrently=True
+            )
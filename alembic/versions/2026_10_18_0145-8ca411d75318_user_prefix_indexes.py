@@ -0,0 +1,41 @@
+"""user prefix indexes
+
+Revision ID: 8ca411d75318
+Revises: 394c8c771246
+Create Date: 2026-10-18 01:45:12.083517+00:00
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8ca411d75318'
+down_revision = '394c8c771246'
+branch_labels = None
+depends_on = None
+
+columns = ['name', 'email']
+
+
+def upgrade() -> None:
+    # text_pattern_ops lets `lower(column) like 'prefix%'` use the index whatever the collation
+    with op.get_context().autocommit_block():
+        for column in columns:
+            name = op.f(f'ix_user_{column}_prefix')
+            # an interrupted concurrent build leaves an invalid index behind
+            op.execute(f'drop index concurrently if exists {name}')
+            op.create_index(
+                name,
+                'user',
+                [sa.text(f'lower({column}) text_pattern_ops')],
+                unique=False,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in reversed(columns):
+            op.drop_index(
+                op.f(f'ix_user_{column}_prefix'), table_name='user', postgresql_concurrently=True
+            )
@@ -1,34 +1,113 @@
 import re
+import time
 from typing import Annotated
 
 from fastapi import Cookie, Depends, Header, HTTPException
 
+from . import config
+from .cache import LRUCache, on_invalidate
+from .models.api_token import get_user_by_token, token_digest
 from .models.user import UserInfo, get
-from .sessions import is_valid_csrf, session_exists
+from .sessions import (
+    is_session_token,
+    is_valid_csrf,
+    is_valid_session_token,
+    revoked_since,
+    session_exists,
+    session_prefix,
+    touch_session,
+)
+
+user_cache: LRUCache[str, UserInfo] = LRUCache(
+    'user', maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL
+)
+
+
+def _invalidate_user(user_id: str) -> None:
+    id_ = int(user_id)
+    user_cache.discard_if(lambda _, user: user.id == id_)
+
+
+def _invalidate_sessions(prefix: str) -> None:
+    user_cache.discard_if(lambda session_id, _: session_id.startswith(f'{prefix}:'))
+
+
+def _invalidate_api_token(digest: str) -> None:
+    user_cache.pop(f'token:{digest}')
+
+
+on_invalidate('session', user_cache.pop)
+on_invalidate('sessions', _invalidate_sessions)
+on_invalidate('user', _invalidate_user)
+on_invalidate('api_token', _invalidate_api_token)
+
+
+def cached_session_user(session_id: str) -> UserInfo | None:
+    """
+    Return the cached user of a session, unless the session expired or was revoked since.
+    Both are checked locally: the denylist and revoked prefixes are kept by every worker.
+    """
+    if not (user := user_cache.get(session_id)):
+        return None
+    if is_session_token(session_id):
+        valid = is_valid_session_token(session_id)
+    else:
+        # an entry cached before the revocation can't be told from one cached after it
+        valid = not revoked_since(session_prefix(session_id), time.time() - config.USER_CACHE_TTL)
+    if not valid:
+        user_cache.pop(session_id)
+        return None
+    return user
+
+
+async def token_user(authorization: str) -> UserInfo:
+    """
+    Authenticate a machine client by its ``Authorization: Bearer <token>`` header.
+    """
+    scheme, _, token = authorization.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        raise HTTPException(status_code=401)
+    key = f'token:{token_digest(token)}'
+    if not (user := user_cache.get(key)):
+        user = await get_user_by_token(token)
+        if not user:
+            raise HTTPException(status_code=401)
+        user_cache.set(key, user)
+    return user
 
 
 async def authenticated_user(
-    session_id: str = Cookie(None), x_csrf_token: str = Header(None)
+    session_id: str = Cookie(None),
+    x_csrf_token: str = Header(None),
+    authorization: str = Header(None),
 ) -> UserInfo:
     """
-    FastAPI Dependency to verify session_id and its correspondent csrf_token.
+    FastAPI Dependency to verify session_id and its correspondent csrf_token,
+    or an API token.
 
     Obs: Cookie(...) and Header(...) would raise 'field required' errors
          instead of 401 errors.
          So, we must use Cookie(None) instead of Cookie(...)
     """
+    # other schemes, such as the Basic credentials of a proxy, are left to the session cookie
+    if authorization and authorization.partition(' ')[0].lower() == 'bearer':
+        return await token_user(authorization)
     if not (
         session_id
         and x_csrf_token
         and (match := re.match(r'user:(\d+):', session_id))
         and is_valid_csrf(session_id, x_csrf_token)
-        and await session_exists(session_id)
     ):
         raise HTTPException(status_code=401)
-    user_id = int(match.group(1))
-    user = await get(user_id)
-    if not user:
-        raise HTTPException(status_code=401)
+    if not (user := cached_session_user(session_id)):
+        if not await session_exists(session_id):
+            raise HTTPException(status_code=401)
+        user_id = int(match.group(1))
+        user = await get(user_id)
+        if not user:
+            raise HTTPException(status_code=401)
+        user_cache.set(session_id, user)
+    touch_session(session_id)
     return user
 
 
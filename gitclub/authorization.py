@@ -1,21 +1,44 @@
+from collections.abc import Awaitable, Callable, Collection, Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import cache
+from typing import Any, TypeVar
 
 from fastapi import HTTPException
 from pydantic import BaseModel
-from sqlalchemy import Table
+from sqlalchemy import Table, and_, exists, false, or_, select, true
+from sqlalchemy.sql import ColumnElement
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from .models.issue import IssueInfo
+from . import config
+from .cache import on_invalidate
+from .models.issue import Issue, IssueInfo
 from .models.organization import Organization, OrganizationInfo
-from .models.repository import RepositoryInfo
-from .models.user import UserInfo
-from .models.user_organization import get_user_role_in_organization
-from .models.user_repository import get_user_role_in_repository
+from .models.repository import Repository, RepositoryInfo
+from .models.user import User, UserInfo
+from .models.user_organization import (
+    UserOrganization,
+    get_user_role_in_organization,
+    get_user_roles_in_organizations,
+)
+from .models.user_repository import (
+    UserRepository,
+    get_user_roles_in_repositories,
+    get_user_roles_in_repository,
+)
+from .role_cache import role_cache
+
+R = TypeVar('R')
 
 # User Roles and actions
 
 user_actions = {}
 user_actions['reader'] = {'read_profile'}
-user_actions['owner'] = user_actions['reader'] | {'update_profile', 'delete_profile'}
+user_actions['owner'] = user_actions['reader'] | {
+    'update_profile',
+    'delete_profile',
+    'manage_tokens',
+}
 
 # Organization Roles and actions
 
@@ -67,44 +90,264 @@ issue_actions['admin'] = issue_actions['creator']
 issue_actions['member'] = issue_actions['reader']
 issue_actions['owner'] = issue_actions['creator']
 
+
+# Compiled policy
+#
+# The tables above are compiled at import: each action becomes a bit and
+# each role the mask of its actions, so that a decision is a single integer test.
+
+action_bits: dict[str, int] = {}
+
+
+def _compile(actions: dict[str, set[str]]) -> dict[str, int]:
+    masks = {}
+    for role, role_actions in actions.items():
+        masks[role] = 0
+        for action in sorted(role_actions):
+            masks[role] |= action_bits.setdefault(action, 1 << len(action_bits))
+    return masks
+
+
+user_masks = _compile(user_actions)
+org_masks = _compile(org_actions)
+repo_masks = _compile(repo_actions)
+issue_masks = _compile(issue_actions)
+CREATE = action_bits.setdefault('create', 1 << len(action_bits))
+
 ResourceType = BaseModel | type[BaseModel | Table]
 
 
+# Request-scoped memoization of roles
+#
+# A request often asks the same question more than once.
+# For example, get_repository checks 'read' on a repository and then the endpoint checks
+# 'list_issues' on the same repository. Both need the same roles.
+# Roles not memoized yet are looked up in the role cache before querying the database.
+
+
+class RoleMemo:
+    def __init__(self) -> None:
+        # (kind, user_id, resource_id) -> role, or (repository role, organization role)
+        self.roles: dict[tuple[str, int, int], Any] = {}
+        self.queries = 0
+
+
+_role_memo: ContextVar[RoleMemo | None] = ContextVar('role_memo', default=None)
+
+
+def _forget_roles(_key: str) -> None:
+    # a role changed during the request
+    if (memo := _role_memo.get()) is not None:
+        memo.roles.clear()
+
+
+on_invalidate('role', _forget_roles)
+
+
+@contextmanager
+def role_memo() -> Iterator[RoleMemo]:
+    """
+    Resolve each (user, resource) role at most once within the block.
+    """
+    memo = RoleMemo()
+    token = _role_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _role_memo.reset(token)
+
+
+class RoleMemoMiddleware:
+    """
+    Wrap each request in a role_memo.
+    In debug mode, the number of role queries is returned in the x-role-queries header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        with role_memo() as memo:
+
+            async def send_wrapper(message: Message) -> None:
+                if message['type'] == 'http.response.start' and config.DEBUG:
+                    headers = message.setdefault('headers', [])
+                    headers.append((b'x-role-queries', str(memo.queries).encode()))
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+
+async def _get_role(
+    kind: str,
+    getter: Callable[[int, int], Awaitable[R]],
+    user_id: int,
+    resource_id: int,
+) -> R:
+    memo = _role_memo.get()
+    key = (kind, user_id, resource_id)
+    if memo is not None and key in memo.roles:
+        return memo.roles[key]
+    cached, stamp = await role_cache.get_many(kind, user_id, (resource_id,))
+    if resource_id in cached:
+        role = cached[resource_id]
+    else:
+        role = await getter(user_id, resource_id)
+        if memo is not None:
+            memo.queries += 1
+        await role_cache.set_many(kind, user_id, {resource_id: role}, stamp)
+    if memo is not None:
+        memo.roles[key] = role
+    return role
+
+
+async def _role_in_organization(user_id: int, organization_id: int) -> str | None:
+    return await _get_role('organization', get_user_role_in_organization, user_id, organization_id)
+
+
+async def _roles_in_repository(user_id: int, repository_id: int) -> tuple[str | None, str | None]:
+    """
+    Return the role of the user in the repository and in its organization.
+    """
+    return await _get_role('repository', get_user_roles_in_repository, user_id, repository_id)
+
+
+# Policies
+#
+# A policy decides whether an actor of a type can do an action (bit) on a resource of a type.
+# Table resources, such as Organization, are registered by the table itself.
+
+Policy = Callable[[Any, int, Any], Awaitable[bool]]
+policies: dict[tuple[type, Any], Policy] = {}
+
+
+@cache
+def _find_policy(actor_type: type, resource_key: Any) -> Policy | None:
+    # subclasses, such as OrganizationMemberInfo, follow the policy of their base class
+    for actor_base in actor_type.__mro__:
+        for resource_base in getattr(resource_key, '__mro__', (resource_key,)):
+            if (actor_base, resource_base) in policies:
+                return policies[actor_base, resource_base]
+    return None
+
+
+def policy(actor_type: type, resource_type: Any) -> Callable[[Policy], Policy]:
+    """
+    Register the decorated function as the policy for ``resource_type`` and ``actor_type``.
+    """
+
+    def register(func: Policy) -> Policy:
+        policies[actor_type, resource_type] = func
+        _find_policy.cache_clear()
+        return func
+
+    return register
+
+
 async def authorized(actor: BaseModel, action: str, resource: ResourceType) -> bool:
-    role: str | None = None
-    match resource, actor:  # noqa: E999
-
-        case UserInfo(id=resource_id), UserInfo(id=actor_id):
-            role = actor_id == resource_id and 'owner' or 'reader'
-            return action in user_actions[role]
-
-        case OrganizationInfo(id=organization_id), UserInfo(id=user_id):
-            role = await get_user_role_in_organization(user_id, organization_id)
-            return bool(role and action in org_actions[role])
-
-        # case Organization, UserInfo(id=user_id) doesn't work
-        # case Organization() also doesn't work since 'Table' object is not callable
-        # see: https://stackoverflow.com/a/70817669
-        case Org, UserInfo(id=user_id) if Org is Organization:
-            return action == 'create'
-
-        case RepositoryInfo(id=repository_id, organization_id=organization_id), UserInfo(
-            id=user_id
-        ):
-            role = await get_user_role_in_repository(
-                user_id, repository_id
-            ) or await get_user_role_in_organization(user_id, organization_id)
-            return bool(role and action in repo_actions[role])
-
-        case IssueInfo(repository_id=repository_id, creator_id=creator_id), UserInfo(id=user_id):
-            role = (
-                user_id == creator_id
-                and 'creator'
-                or await get_user_role_in_repository(user_id, repository_id)
-            )
-            return bool(role and action in issue_actions[role])
-
-    raise NotImplementedError(f'authorization not implemented for {actor} {action} {resource}')
+    resource_key = resource if isinstance(resource, Table) else type(resource)
+    decide = _find_policy(type(actor), resource_key)
+    if decide is None:
+        raise NotImplementedError(f'authorization not implemented for {actor} {action} {resource}')
+    return await decide(actor, action_bits.get(action, 0), resource)
+
+
+@policy(UserInfo, UserInfo)
+async def _user_policy(actor: UserInfo, action: int, user: UserInfo) -> bool:
+    role = actor.id == user.id and 'owner' or 'reader'
+    return bool(user_masks[role] & action)
+
+
+@policy(UserInfo, OrganizationInfo)
+async def _organization_policy(
+    actor: UserInfo, action: int, organization: OrganizationInfo
+) -> bool:
+    role = await _role_in_organization(actor.id, organization.id)
+    return bool(role and org_masks[role] & action)
+
+
+@policy(UserInfo, Organization)
+async def _organizations_policy(_actor: UserInfo, action: int, _table: Table) -> bool:
+    return action == CREATE
+
+
+@policy(UserInfo, RepositoryInfo)
+async def _repository_policy(actor: UserInfo, action: int, repository: RepositoryInfo) -> bool:
+    repository_role, organization_role = await _roles_in_repository(actor.id, repository.id)
+    role = repository_role or organization_role
+    return bool(role and repo_masks[role] & action)
+
+
+@policy(UserInfo, IssueInfo)
+async def _issue_policy(actor: UserInfo, action: int, issue: IssueInfo) -> bool:
+    role: str | None
+    if actor.id == issue.creator_id:
+        role = 'creator'
+    else:
+        repository_role, organization_role = await _roles_in_repository(
+            actor.id, issue.repository_id
+        )
+        role = repository_role or organization_role
+    return bool(role and issue_masks[role] & action)
+
+
+async def _prefetch_roles(
+    memo: RoleMemo,
+    kind: str,
+    getter: Callable[[int, Collection[int]], Awaitable[dict[int, Any]]],
+    user_id: int,
+    resource_ids: set[int],
+) -> None:
+    """
+    Load into the memo all the roles of a user that are not there yet,
+    from the role cache or else in a single query.
+    """
+    missing = {id_ for id_ in resource_ids if (kind, user_id, id_) not in memo.roles}
+    if not missing:
+        return
+    roles, stamp = await role_cache.get_many(kind, user_id, missing)
+    if missing := missing - roles.keys():
+        memo.queries += 1
+        loaded = await getter(user_id, missing)
+        loaded = {id_: loaded.get(id_) for id_ in missing}
+        await role_cache.set_many(kind, user_id, loaded, stamp)
+        roles |= loaded
+    for id_, role in roles.items():
+        memo.roles[kind, user_id, id_] = role
+
+
+async def authorized_many(
+    actor: BaseModel, action: str, resources: Sequence[ResourceType]
+) -> list[bool]:
+    """
+    Same as ``authorized`` for each resource, but the roles needed are resolved beforehand
+    with a query per resource type instead of a query per resource.
+    Returns a mask in the same order as ``resources``.
+    """
+    memo = _role_memo.get()
+    if memo is None:
+        with role_memo():
+            return await authorized_many(actor, action, resources)
+
+    if isinstance(actor, UserInfo):
+        repository_ids = {
+            r.id if isinstance(r, RepositoryInfo) else r.repository_id
+            for r in resources
+            if isinstance(r, RepositoryInfo | IssueInfo)
+        }
+        await _prefetch_roles(
+            memo, 'repository', get_user_roles_in_repositories, actor.id, repository_ids
+        )
+        organization_ids = {r.id for r in resources if isinstance(r, OrganizationInfo)}
+        await _prefetch_roles(
+            memo, 'organization', get_user_roles_in_organizations, actor.id, organization_ids
+        )
+
+    return [await authorized(actor, action, resource) for resource in resources]
 
 
 async def check_authz(actor: BaseModel, action: str, resource: ResourceType) -> bool:
@@ -135,12 +378,118 @@ def check_resource_role(resource: str, role: str) -> bool:
 
 @cache
 def action_to_roles(action: str, resource: str) -> set[str]:
-    resources = {
-        'user': user_actions,
-        'organization': org_actions,
-        'repository': repo_actions,
-        'issue': issue_actions,
+    masks = {
+        'user': user_masks,
+        'organization': org_masks,
+        'repository': repo_masks,
+        'issue': issue_masks,
     }
-    if resource not in resources:
+    if resource not in masks:
         raise NotImplementedError(f'authorization not implemented for {resource}')
-    return {role for role in resource_roles(resource) if action in resources[resource][role]}
+    bit = action_bits.get(action, 0)
+    return {role for role in resource_roles(resource) if masks[resource][role] & bit}
+
+
+# SQL policy
+#
+# authorization_filter compiles the same policy into a predicate,
+# so that listings only fetch the rows the actor is authorized to.
+
+
+@cache
+def _granting_roles(action: str, resource: str, role_resource: str) -> list[str]:
+    """
+    Roles of ``role_resource`` that allow ``action`` on ``resource``.
+    For example, the organization roles that allow reading a repository.
+    """
+    masks = {'repository': repo_masks, 'issue': issue_masks}[resource]
+    bit = action_bits.get(action, 0)
+    return sorted(role for role in resource_roles(role_resource) if masks[role] & bit)
+
+
+def _has_organization_role(
+    user_id: int, organization_id: ColumnElement, roles: list[str]
+) -> ColumnElement:
+    return exists().where(
+        UserOrganization.c.user_id == user_id,
+        UserOrganization.c.organization_id == organization_id,
+        UserOrganization.c.role.in_(roles),
+    )
+
+
+def _has_repository_role(
+    user_id: int, repository_id: ColumnElement, roles: list[str]
+) -> ColumnElement:
+    return exists().where(
+        UserRepository.c.user_id == user_id,
+        UserRepository.c.repository_id == repository_id,
+        UserRepository.c.role.in_(roles),
+    )
+
+
+def _has_effective_role(
+    user_id: int,
+    action: str,
+    resource: str,
+    repository_id: ColumnElement,
+    organization_id: ColumnElement,
+) -> ColumnElement:
+    """
+    A role in the repository takes precedence over the role in its organization.
+    """
+    return or_(
+        _has_repository_role(
+            user_id, repository_id, _granting_roles(action, resource, 'repository')
+        ),
+        and_(
+            ~exists().where(
+                UserRepository.c.user_id == user_id,
+                UserRepository.c.repository_id == repository_id,
+            ),
+            _has_organization_role(
+                user_id, organization_id, _granting_roles(action, resource, 'organization')
+            ),
+        ),
+    )
+
+
+def authorization_filter(actor: BaseModel, action: str, table: Table) -> ColumnElement:
+    """
+    Return a predicate over the rows of ``table`` that holds where
+    ``authorized(actor, action, row)`` would be true.
+    """
+    if not isinstance(actor, UserInfo):
+        raise NotImplementedError(f'authorization not implemented for {actor} {action} {table}')
+    user_id = actor.id
+
+    if table is User:
+        roles = action_to_roles(action, 'user')
+        if 'reader' in roles:
+            return true()
+        return User.c.id == user_id if 'owner' in roles else false()
+
+    if table is Organization:
+        org_roles = sorted(action_to_roles(action, 'organization'))
+        return _has_organization_role(user_id, Organization.c.id, org_roles)
+
+    if table is Repository:
+        return _has_effective_role(
+            user_id, action, 'repository', Repository.c.id, Repository.c.organization_id
+        )
+
+    if table is Issue:
+        organization_id = (
+            select(Repository.c.organization_id)
+            .where(Repository.c.id == Issue.c.repository_id)
+            .correlate(Issue)
+            .scalar_subquery()
+        )
+        granted = _has_effective_role(
+            user_id, action, 'issue', Issue.c.repository_id, organization_id
+        )
+        # the creator of an issue has the 'creator' role, whatever their other roles
+        if issue_masks['creator'] & action_bits.get(action, 0):
+            return or_(Issue.c.creator_id == user_id, granted)
+        return and_(Issue.c.creator_id != user_id, granted)
+
+    raise NotImplementedError(f'authorization not implemented for {actor} {action} {table}')
@@ -0,0 +1,70 @@
+"""
+Automatic pipelining of Redis commands.
+
+Under load, many requests query Redis at about the same time.
+Instead of a round trip per command, commands issued during the same
+event loop iteration are sent together in a single pipeline and
+the results are handed back to each caller.
+"""
+import asyncio
+from typing import Any
+
+from redis.asyncio import Redis
+
+from . import metrics
+from .resources import redis
+
+
+class AutoPipeline:
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+        self.batches = 0
+        self.commands = 0
+        self._queue: list[tuple[tuple[Any, ...], asyncio.Future]] = []
+        self._flushes: set[asyncio.Task] = set()
+
+    async def execute(self, *args: Any) -> Any:
+        """
+        Queue a command, such as ``('EXISTS', key)``, and wait for its result.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if not self._queue:
+            # runs after the coroutines that are ready in this iteration had their turn
+            task = asyncio.create_task(self._flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        self._queue.append((args, future))
+        return await future
+
+    async def _flush(self) -> None:
+        queue, self._queue = self._queue, []
+        self.batches += 1
+        self.commands += len(queue)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for args, _ in queue:
+                    pipe.execute_command(*args)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as error:
+            for _, future in queue:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(queue, results, strict=True):
+            if future.done():  # the caller gave up waiting
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'batches': self.batches,
+            'commands': self.commands,
+            'commands_per_batch': self.commands / self.batches if self.batches else 0,
+        }
+
+
+autopipeline = AutoPipeline(redis)
+metrics.register('redis_autopipeline', autopipeline.stats)
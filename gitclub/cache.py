@@ -0,0 +1,151 @@
+"""
+Bounded in-process caches and their invalidation across workers.
+
+Every worker keeps its own copy of the cached data.
+When a worker changes something that might be cached,
+it calls ``invalidate(namespace, key)``, which evicts the entry locally and
+broadcasts the message through Redis pub/sub so that the other workers do the same.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from contextlib import suppress
+from typing import Any, Generic, TypeVar, overload
+
+from loguru import logger
+from redis.exceptions import RedisError
+
+from . import metrics
+from .resources import redis
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+D = TypeVar('D')
+
+INVALIDATION_CHANNEL = 'gitclub:invalidate'
+
+caches: dict[str, 'LRUCache[Any, Any]'] = {}
+handlers: dict[str, list[Callable[[str], None]]] = {}
+_tasks: list[asyncio.Task] = []
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Mapping with least-recently-used eviction and a time to live for each entry.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = self.misses = self.evictions = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        caches[name] = self
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @overload
+    def get(self, key: K) -> V | None:
+        ...
+
+    @overload
+    def get(self, key: K, default: D) -> V | D:
+        ...
+
+    def get(self, key: K, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is not None and item[0] < time.monotonic():
+            del self._data[key]
+            item = None
+        if item is None:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: K, value: V) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: K) -> None:
+        self._data.pop(key, None)
+
+    def discard_if(self, predicate: Callable[[K, V], bool]) -> None:
+        """
+        Remove all entries for which ``predicate(key, value)`` is true.
+        """
+        for key in [k for k, (_, v) in self._data.items() if predicate(k, v)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+metrics.register('caches', cache_stats)
+
+
+def on_invalidate(namespace: str, handler: Callable[[str], None]) -> None:
+    """
+    Register a handler to be called with the key of every invalidation of ``namespace``.
+    """
+    handlers.setdefault(namespace, []).append(handler)
+
+
+def _dispatch(message: str) -> None:
+    namespace, _, key = message.partition(':')
+    for handler in handlers.get(namespace, ()):
+        handler(key)
+
+
+async def invalidate(namespace: str, key: str | int) -> None:
+    message = f'{namespace}:{key}'
+    _dispatch(message)
+    await redis.publish(INVALIDATION_CHANNEL, message)
+
+
+async def _listen() -> None:
+    while True:
+        try:
+            async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # invalidations might have been lost while we were not subscribed
+                for cache in caches.values():
+                    cache.clear()
+                async for message in pubsub.listen():
+                    _dispatch(message['data'].decode())
+        except (RedisError, OSError) as error:
+            logger.warning(f'Cache invalidation listener disconnected: {error}')
+            await asyncio.sleep(1)
+
+
+async def startup() -> None:
+    _tasks.append(asyncio.create_task(_listen()))
+
+
+async def shutdown() -> None:
+    while _tasks:
+        task = _tasks.pop()
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
@@ -22,14 +22,67 @@ DB_HOST = os.environ['DB_HOST']
 DB_PORT = os.environ['DB_PORT']
 DB_NAME = (TESTING and 'test_' or '') + os.environ['DB_NAME']
 DATABASE_URL = f'postgresql://postgres:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+# asyncpg connection pool
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 10))  # noqa: PLW1508
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))  # noqa: PLW1508
+# connections are replaced after DB_MAX_QUERIES queries or DB_MAX_INACTIVE_LIFETIME idle seconds
+DB_MAX_QUERIES = int(os.getenv('DB_MAX_QUERIES', 50_000))  # noqa: PLW1508
+DB_MAX_INACTIVE_LIFETIME = float(os.getenv('DB_MAX_INACTIVE_LIFETIME', 300))  # noqa: PLW1508
+# prepared statements cached per connection, 0 behind pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100))  # noqa: PLW1508
+# seconds to wait for a free connection before answering 503
+DB_ACQUIRE_TIMEOUT = float(os.getenv('DB_ACQUIRE_TIMEOUT', 5))  # noqa: PLW1508
+# comma separated URLs of read replicas, see gitclub.replicas
+DATABASE_REPLICA_URLS = [url for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url]
+# seconds a client reads from the primary after writing, longer than the replication lag
+REPLICA_STICKINESS = int(os.getenv('REPLICA_STICKINESS', 5))  # noqa: PLW1508
 
 REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
 REDIS_PORT = os.getenv('REDIS_PORT', '6379')
 REDIS_URL = os.getenv('REDIS_URL') or f'redis://{REDIS_HOST}:{REDIS_PORT}'
 
 SECRET_KEY = bytes(os.getenv('SECRET_KEY', ''), 'utf-8') or secrets.token_bytes(32)
+# bearer token required by /metrics, which is disabled (404) without it
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
 SESSION_ID_LENGTH = int(os.getenv('SESSION_ID_LENGTH', 16))  # noqa: PLW1508
 SESSION_LIFETIME = int(timedelta(days=7).total_seconds())
+# active sessions have their lifetime renewed at most once per interval
+SESSION_REFRESH_INTERVAL = int(os.getenv('SESSION_REFRESH_INTERVAL', 3600))  # noqa: PLW1508
+# sessions renewed recently, remembered by each worker to skip their renewal
+SESSION_REFRESH_CACHE_SIZE = int(os.getenv('SESSION_REFRESH_CACHE_SIZE', 10_000))  # noqa: PLW1508
+# signed session tokens are validated without a Redis round trip
+STATELESS_SESSIONS = os.getenv('STATELESS_SESSIONS', 'false').lower() == 'true'
+DENYLIST_SYNC_INTERVAL = int(os.getenv('DENYLIST_SYNC_INTERVAL', 5))  # noqa: PLW1508
+
+# in-process cache of authenticated users, keyed by session_id
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10_000))  # noqa: PLW1508
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))  # noqa: PLW1508
+
+# roles of users in organizations and repositories, cached in process and optionally in Redis
+ROLE_CACHE_SIZE = int(os.getenv('ROLE_CACHE_SIZE', 100_000))  # noqa: PLW1508
+ROLE_CACHE_TTL = int(os.getenv('ROLE_CACHE_TTL', 300))  # noqa: PLW1508
+ROLE_CACHE_REDIS = os.getenv('ROLE_CACHE_REDIS', 'false').lower() == 'true'
+
+# organizations, repositories and issues, cached in process and in Redis, see gitclub.entity_cache
+ENTITY_CACHE_SIZE = int(os.getenv('ENTITY_CACHE_SIZE', 10_000))  # noqa: PLW1508
+ENTITY_CACHE_TTL = int(os.getenv('ENTITY_CACHE_TTL', 300))  # noqa: PLW1508
+ENTITY_CACHE_REDIS = os.getenv('ENTITY_CACHE_REDIS', 'true').lower() == 'true'
+
+# list endpoints return at most MAX_PAGE_SIZE items, PAGE_SIZE if no limit is given
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', 100))  # noqa: PLW1508
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 1000))  # noqa: PLW1508
+# member search returns the first SEARCH_LIMIT matches, at most MAX_SEARCH_LIMIT
+SEARCH_LIMIT = int(os.getenv('SEARCH_LIMIT', 10))  # noqa: PLW1508
+MAX_SEARCH_LIMIT = int(os.getenv('MAX_SEARCH_LIMIT', 100))  # noqa: PLW1508
+# streamed responses are sent in chunks of at least STREAM_CHUNK_SIZE bytes
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 65_536))  # noqa: PLW1508
+
+# argon2 runs in a pool of HASH_WORKERS processes (0 runs it in the event loop)
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', 2))  # noqa: PLW1508
+HASH_QUEUE_SIZE = int(os.getenv('HASH_QUEUE_SIZE', 32))  # noqa: PLW1508
+# calibrate argon2 costs to a target hash latency (0 keeps the library defaults)
+HASH_TARGET_MS = int(os.getenv('HASH_TARGET_MS', 0))  # noqa: PLW1508
+HASH_MAX_MEMORY_KIB = int(os.getenv('HASH_MAX_MEMORY_KIB', 65536))  # noqa: PLW1508
 
 PASSWORD_MIN_LENGTH = int(os.getenv('PASSWORD_MIN_LENGTH', 15))  # noqa: PLW1508
 PASSWORD_MIN_VARIETY = int(os.getenv('PASSWORD_MIN_VARIETY', 5))  # noqa: PLW1508
@@ -0,0 +1,191 @@
+"""
+Read-through cache of organizations, repositories and issues by id.
+
+Those rows are read by nearly every nested route and almost never change.
+Each worker keeps the models it used in an LRUCache and, when ``config.ENTITY_CACHE_REDIS``
+is set, rows are shared through Redis under ``entity:{name}:{id}``,
+as the JSON array of the values of the fields of the model.
+
+Misses go through a Loader: the concurrent misses of a worker are resolved together,
+looking the ids up in Redis with one MGET, then the ones still missing in the database
+with one query, whose rows are written back to Redis. An expired row is thus read
+from the database at most once per worker, however many requests wait for it.
+That query goes to the primary, even for requests that read from a replica,
+so that a row older than an eviction is never cached.
+Each eviction also increments the version ``entity-version:{name}:{id}`` of the row,
+which is read along with the rows: a row is only written back if its version
+didn't change meanwhile, so that a worker can't write back a row that another worker
+evicted before the message of the eviction reached it.
+When Redis is unavailable, the rows are read from the database only.
+
+Functions that change a row call ``EntityCache.evict``, which deletes it from Redis
+and from the local cache of every worker once the transaction commits.
+Lookups within a transaction bypass the cache, so that uncommitted rows are never cached.
+Missing ids are not cached, so inserting a row doesn't need an eviction.
+"""
+from collections.abc import Sequence
+from typing import Any, Generic
+
+import orjson
+from loguru import logger
+from redis.exceptions import RedisError
+
+from . import config, metrics
+from .autopipeline import autopipeline
+from .cache import LRUCache, invalidate, on_invalidate
+from .loader import Loader, Row
+from .models import M, from_row
+from .replicas import primary
+from .resources import db, redis
+from .statements import Statement
+
+# sets each key KEYS[i] to its value if the version KEYS[i + 1] is still the one expected,
+# with ARGV[1] the TTL followed by the expected version and the value of each key
+_set_if_version = redis.register_script(
+    """
+    local written = 0
+    for i = 1, #KEYS, 2 do
+        if (redis.call('GET', KEYS[i + 1]) or '') == ARGV[i + 1] then
+            redis.call('SET', KEYS[i], ARGV[i + 2], 'EX', ARGV[1])
+            written = written + 1
+        end
+    end
+    return written
+    """
+)
+
+
+class EntityCache(Generic[M]):
+    def __init__(self, name: str, model: type[M], stmt: Statement) -> None:
+        """
+        ``stmt`` selects the rows whose id is in its ``ids`` parameter.
+        """
+        self.name = name
+        self.model = model
+        self.statement = stmt
+        self.fields = list(model.__fields__)
+        self.ttl = config.ENTITY_CACHE_TTL
+        self.shared = config.ENTITY_CACHE_REDIS
+        self.local: LRUCache[int, M] = LRUCache(name, config.ENTITY_CACHE_SIZE, self.ttl)
+        self.loader = Loader(name, self._fetch)
+        self.redis_hits = self.redis_misses = self.db_reads = 0
+        # incremented by each eviction, so that a row read before an eviction is not cached after it
+        self.generation = 0
+        entity_caches[name] = self
+        on_invalidate(name, self._discard)
+
+    def _key(self, id_: int | str) -> str:
+        return f'entity:{self.name}:{id_}'
+
+    def _version_key(self, id_: int | str) -> str:
+        return f'entity-version:{self.name}:{id_}'
+
+    async def get(self, id_: int) -> M | None:
+        if db.in_transaction():
+            rows = await self.statement.fetch_all(ids=[id_])
+            return from_row(self.model, rows[0]) if rows else None
+        if (entity := self.local.get(id_)) is not None:
+            return entity
+        generation = self.generation
+        row = await self.loader.load(id_)
+        if row is None:
+            return None
+        entity = from_row(self.model, row)
+        if generation == self.generation:
+            self.local.set(id_, entity)
+        return entity
+
+    async def _fetch(self, ids: list[int]) -> Sequence[Row]:
+        rows: list[Row] = []
+        missing = ids
+        values = versions = None
+        if self.shared:
+            keys = [self._key(id_) for id_ in ids] + [self._version_key(id_) for id_ in ids]
+            try:
+                results = await autopipeline.execute('MGET', *keys)
+            except (RedisError, OSError) as error:
+                logger.warning(f'Could not read {self.name} rows from Redis: {error}')
+            else:
+                values = results[: len(ids)]
+                versions = dict(zip(ids, results[len(ids) :], strict=True))
+        if values is not None:
+            missing = []
+            for id_, value in zip(ids, values, strict=True):
+                if value is None:
+                    missing.append(id_)
+                else:
+                    rows.append(dict(zip(self.fields, orjson.loads(value), strict=True)))
+            self.redis_hits += len(ids) - len(missing)
+            self.redis_misses += len(missing)
+        if not missing:
+            return rows
+        generation = self.generation
+        self.db_reads += len(missing)
+        # a replica might not have replayed the last eviction yet
+        with primary():
+            found = await self.statement.fetch_all(ids=missing)
+        rows.extend(found)
+        # not when Redis was just found unavailable
+        if versions is not None and found and generation == self.generation:
+            await self._write_back(found, versions)
+        return rows
+
+    async def _write_back(self, rows: Sequence[Row], versions: dict[int, bytes | None]) -> None:
+        """
+        Share rows read from the database, unless evicted since their versions were read.
+        """
+        keys: list[str] = []
+        args: list[int | bytes] = [self.ttl]
+        for row in rows:
+            keys += (self._key(row['id']), self._version_key(row['id']))
+            args += (
+                versions[row['id']] or b'',
+                orjson.dumps([row[field] for field in self.fields]),
+            )
+        try:
+            await _set_if_version(keys=keys, args=args)
+        except (RedisError, OSError) as error:
+            logger.warning(f'Could not write {self.name} rows to Redis: {error}')
+
+    async def evict(self, id_: int) -> None:
+        """
+        Evict a changed row from Redis and from every worker, once the current transaction commits.
+        """
+
+        async def evict() -> None:
+            if self.shared:
+                async with redis.pipeline(transaction=True) as pipe:
+                    pipe.delete(self._key(id_))
+                    pipe.incr(self._version_key(id_))
+                    # forgotten with the rows written before it
+                    pipe.expire(self._version_key(id_), self.ttl)
+                    await pipe.execute()
+            await invalidate(self.name, id_)
+
+        await db.after_commit(evict)
+
+    def _discard(self, id_: str) -> None:
+        self.generation += 1
+        self.local.pop(int(id_))
+
+    def stats(self) -> dict[str, Any]:
+        local = self.local.stats()
+        lookups = local['hits'] + local['misses']
+        return {
+            **local,
+            'redis_hits': self.redis_hits,
+            'redis_misses': self.redis_misses,
+            'db_reads': self.db_reads,
+            # lookups answered without a query, by either tier or by a query already in flight
+            'hit_ratio': 1 - self.db_reads / lookups if lookups else 0,
+        }
+
+
+entity_caches: dict[str, EntityCache[Any]] = {}
+
+
+def entity_cache_stats() -> dict[str, Any]:
+    return {name: cache.stats() for name, cache in sorted(entity_caches.items())}
+
+
+metrics.register('entity_caches', entity_cache_stats)
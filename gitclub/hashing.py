@@ -0,0 +1,224 @@
+"""
+Password hashing service.
+
+argon2 is slow on purpose. Running it inside a request handler would block the
+event loop and every other request of the worker would wait for it.
+So hashes are computed and verified in a pool of processes instead.
+
+The number of pending operations is bounded.
+When the pool is saturated, new operations fail immediately with ``HashingBusyError``
+instead of piling up.
+
+argon2 costs can be calibrated to a target latency (``config.HASH_TARGET_MS``).
+Hashes made with other costs are rehashed on the next successful login.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from statistics import quantiles
+from typing import Any, TypeVar
+
+import orjson
+from loguru import logger
+from passlib.context import CryptContext
+from passlib.hash import argon2
+
+from . import config, metrics
+from .resources import redis
+
+T = TypeVar('T')
+
+crypt_ctx = CryptContext(schemes=['argon2'])
+
+MIN_MEMORY_COST = 8 * argon2.parallelism  # KiB
+
+
+class HashingBusyError(Exception):
+    pass
+
+
+def _hash(password: str) -> str:
+    return crypt_ctx.hash(password)
+
+
+def _verify(password: str, hash: str) -> bool:
+    return crypt_ctx.verify(password, hash)
+
+
+def _verify_and_update(password: str, hash: str) -> tuple[bool, str | None]:
+    return crypt_ctx.verify_and_update(password, hash)
+
+
+def configure(settings: dict[str, int]) -> None:
+    """
+    Set argon2 costs (``time_cost`` and ``memory_cost``) of new hashes.
+    """
+    crypt_ctx.update(**{f'argon2__{key}': value for key, value in settings.items()})
+
+
+def _init_worker(settings: dict[str, int]) -> None:
+    # lower priority so that request handling wins when CPUs are scarce
+    os.nice(10)
+    configure(settings)
+
+
+def _hash_duration(time_cost: int, memory_cost: int) -> float:
+    """Return how long (ms) a hash takes with the given costs"""
+    handler = argon2.using(time_cost=time_cost, memory_cost=memory_cost)
+    start = time.perf_counter()
+    handler.hash('calibration')
+    return (time.perf_counter() - start) * 1000
+
+
+def calibrate(target_ms: float, max_memory_kib: int) -> dict[str, int]:
+    """
+    Find argon2 costs that make a hash take about ``target_ms`` on this machine,
+    using at most ``max_memory_kib`` of memory.
+
+    Memory is preferred over time since it is what makes attacks expensive.
+    So, memory is only reduced if a single pass over the maximum memory
+    already exceeds the target. Then, passes are added while they fit in the target.
+    """
+    memory_cost = max(max_memory_kib, MIN_MEMORY_COST)
+    duration = _hash_duration(1, memory_cost)
+    while duration > target_ms and memory_cost > MIN_MEMORY_COST:
+        memory_cost = max(memory_cost // 2, MIN_MEMORY_COST)
+        duration = _hash_duration(1, memory_cost)
+    time_cost = max(1, int(target_ms // duration))
+    return {'time_cost': time_cost, 'memory_cost': memory_cost}
+
+
+class HashingService:
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self.settings: dict[str, int] = {}
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0  # raised or cancelled
+        self.rejected = 0
+        self.latencies: deque[float] = deque(maxlen=1000)
+        self._executor: ProcessPoolExecutor | None = None
+
+    def start(self, settings: dict[str, int] | None = None) -> None:
+        if settings is not None:
+            self.settings = settings
+            configure(settings)
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                mp_context=get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.settings,),
+            )
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        if self.pending >= self.queue_size:
+            self.rejected += 1
+            raise HashingBusyError()
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            if self._executor is None:  # no workers: run in the event loop
+                result = func(*args)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._executor, func, *args)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        self.latencies.append((time.perf_counter() - start) * 1000)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hash: str) -> bool:
+        return await self._run(_verify, password, hash)
+
+    async def verify_and_update(self, password: str, hash: str) -> tuple[bool, str | None]:
+        """
+        Verify a password and also return a new hash if the current one
+        was made with outdated costs.
+        """
+        return await self._run(_verify_and_update, password, hash)
+
+    def stats(self) -> dict[str, Any]:
+        latencies = list(self.latencies)
+        p50 = p99 = None
+        if len(latencies) > 1:
+            percentiles = quantiles(latencies, n=100)
+            p50, p99 = percentiles[49], percentiles[98]
+        return {
+            **self.settings,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'queue_depth': self.pending,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'latency_p50_ms': p50,
+            'latency_p99_ms': p99,
+        }
+
+
+hasher = HashingService(config.HASH_WORKERS, config.HASH_QUEUE_SIZE)
+metrics.register('hashing', hasher.stats)
+
+
+def calibration_key() -> str:
+    return f'hashing:argon2:{config.HASH_TARGET_MS}:{config.HASH_MAX_MEMORY_KIB}'
+
+
+async def calibrated_settings() -> dict[str, int]:
+    """
+    Return the calibrated argon2 costs.
+
+    The first worker to start calibrates and shares the result through Redis,
+    so that all workers produce hashes with the same costs.
+    Otherwise, each login would rehash the password with the costs of
+    whichever worker handled it.
+    The costs are kept until ``recalibrate`` is called, for the same reason.
+    """
+    key = calibration_key()
+    if not (value := await redis.get(key)):
+        settings = await asyncio.to_thread(
+            calibrate, config.HASH_TARGET_MS, config.HASH_MAX_MEMORY_KIB
+        )
+        await redis.set(key, orjson.dumps(settings), nx=True)
+        value = await redis.get(key)
+    return orjson.loads(value)  # type: ignore
+
+
+async def recalibrate() -> dict[str, int]:
+    """
+    Calibrate again, after a hardware change for example, and share the new costs.
+    Workers use them once restarted.
+    """
+    settings = await asyncio.to_thread(calibrate, config.HASH_TARGET_MS, config.HASH_MAX_MEMORY_KIB)
+    await redis.set(calibration_key(), orjson.dumps(settings))
+    return settings
+
+
+async def startup() -> None:
+    settings = None
+    if config.HASH_TARGET_MS:
+        settings = await calibrated_settings()
+        logger.info(f'argon2 costs calibrated to {config.HASH_TARGET_MS}ms: {settings}')
+    hasher.start(settings)
+
+
+async def shutdown() -> None:
+    hasher.stop()
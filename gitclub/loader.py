@@ -0,0 +1,111 @@
+"""
+Batched lookups of rows by id.
+
+Concurrent requests often look up rows of the same table at about the same time.
+Like gitclub.autopipeline does for Redis, the lookups issued during the same
+event loop iteration are resolved together, by a single ``id = any(:ids)`` query,
+and identical lookups in flight share their result.
+
+Lookups made within a transaction are not batched:
+the batch is read outside of it and wouldn't see what the transaction wrote.
+"""
+import asyncio
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+from contextvars import Context
+from typing import Any
+from weakref import WeakKeyDictionary
+
+from . import metrics
+from .replicas import read_your_writes, use_replica
+from .resources import db
+
+Row = Mapping[str, Any]
+# lookups that can be read from a replica and those that can't are batched apart
+Key = tuple[bool, int]
+
+
+class _LoopState:
+    def __init__(self) -> None:
+        self.in_flight: dict[Key, asyncio.Future[Row | None]] = {}
+        # ids of the next batch
+        self.pending: dict[bool, list[int]] = {}
+
+
+class Loader:
+    def __init__(self, name: str, fetch: Callable[[list[int]], Awaitable[Sequence[Row]]]) -> None:
+        """
+        ``fetch`` returns the rows, with an ``id`` column, of the ids it's given.
+        """
+        self.name = name
+        self.fetch = fetch
+        self.loads = self.shared = self.unbatched = 0
+        self.batches = self.ids = 0
+        # futures are bound to their event loop
+        self._states: WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState] = WeakKeyDictionary()
+        self._flushes: set[asyncio.Task] = set()
+        loaders[name] = self
+
+    async def load(self, id_: int) -> Row | None:
+        self.loads += 1
+        if db.in_transaction():
+            self.unbatched += 1
+            return next(iter(await self.fetch([id_])), None)
+
+        loop = asyncio.get_running_loop()
+        state = self._states.setdefault(loop, _LoopState())
+        replica = use_replica()
+        future = state.in_flight.get((replica, id_))
+        if future is None:
+            future = state.in_flight[replica, id_] = loop.create_future()
+            pending = state.pending.setdefault(replica, [])
+            if not pending:
+                # without the connection of the caller, which belongs to its request
+                task = loop.create_task(self._flush(state, replica), context=Context())
+                self._flushes.add(task)
+                task.add_done_callback(self._flushes.discard)
+            pending.append(id_)
+        else:
+            self.shared += 1
+        # a caller that gives up waiting doesn't cancel the lookup of the others
+        return await asyncio.shield(future)
+
+    async def _flush(self, state: _LoopState, replica: bool) -> None:
+        ids = state.pending.pop(replica)
+        self.batches += 1
+        self.ids += len(ids)
+        try:
+            if replica:
+                with read_your_writes():
+                    rows = await self.fetch(ids)
+            else:
+                rows = await self.fetch(ids)
+        except Exception as error:
+            for id_ in ids:
+                future = state.in_flight.pop((replica, id_))
+                if not future.done():
+                    future.set_exception(error)
+            return
+        by_id = {row['id']: row for row in rows}
+        for id_ in ids:
+            future = state.in_flight.pop((replica, id_))
+            if not future.done():
+                future.set_result(by_id.get(id_))
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'loads': self.loads,
+            'shared': self.shared,
+            'unbatched': self.unbatched,
+            'batches': self.batches,
+            'ids_per_batch': self.ids / self.batches if self.batches else 0,
+        }
+
+
+loaders: dict[str, Loader] = {}
+
+
+def loader_stats() -> dict[str, Any]:
+    return {name: loader.stats() for name, loader in sorted(loaders.items())}
+
+
+metrics.register('loaders', loader_stats)
@@ -1,13 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.responses import ORJSONResponse
 
-from . import config
-from .resources import shutdown, startup
-from .routers import hello, issue, login, organization, repository, user
+from . import cache, config, hashing, sessions
+from .authorization import RoleMemoMiddleware
+from .replicas import ReadYourWritesMiddleware
+from .resources import DatabaseBusyError, shutdown, startup
+from .routers import hello, issue, login, metrics, organization, repository, user
 
 routers = [
     hello.router,
     login.router,
+    metrics.router,
     issue.router,
     organization.router,
     repository.router,
@@ -18,9 +21,22 @@ app = FastAPI(
     title='GitClub FastAPI',
     debug=config.DEBUG,
     default_response_class=ORJSONResponse,
-    on_startup=(startup,),
-    on_shutdown=(shutdown,),
+    on_startup=(startup, cache.startup, sessions.startup, hashing.startup),
+    on_shutdown=(hashing.shutdown, sessions.shutdown, cache.shutdown, shutdown),
 )
 
+app.add_middleware(RoleMemoMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+
+
+@app.exception_handler(DatabaseBusyError)
+async def database_busy(request: Request, exc: DatabaseBusyError) -> ORJSONResponse:  # noqa: ARG001
+    return ORJSONResponse(
+        {'detail': 'the database is busy'},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '1'},
+    )
+
+
 for router in routers:
     app.include_router(router)
@@ -0,0 +1,17 @@
+from collections.abc import Callable
+from typing import Any
+
+Collector = Callable[[], dict[str, Any]]
+
+collectors: dict[str, Collector] = {}
+
+
+def register(name: str, collector: Collector) -> None:
+    """
+    Register a function that returns a snapshot of some internal counters.
+    """
+    collectors[name] = collector
+
+
+def collect() -> dict[str, dict[str, Any]]:
+    return {name: collector() for name, collector in sorted(collectors.items())}
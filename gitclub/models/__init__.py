@@ -1,7 +1,10 @@
+from collections.abc import Iterable, Mapping
 from pathlib import Path
 from secrets import randbelow
-from typing import Any
+from typing import Any, TypeVar
 
+import asyncpg
+from databases.interfaces import Record
 from pydantic import BaseModel
 from sqlalchemy import MetaData
 
@@ -14,6 +17,8 @@ __all__ = [p.stem for p in modules if p.is_file() and p.stem != '__init__']
 
 MAX_ID = 2**31
 
+M = TypeVar('M', bound=BaseModel)
+
 
 def random_id() -> int:
     """
@@ -37,3 +42,21 @@ def diff_models(from_: BaseModel, to_: BaseModel) -> dict[str, Any]:
     from_dict = from_.dict()
     to_dict = to_.dict(exclude_unset=True)
     return {k: v for k, v in to_dict.items() if from_dict.get(k) != v}
+
+
+def from_row(model: type[M], row: Record | asyncpg.Record | Mapping[str, Any]) -> M:
+    """
+    Build a model from a row of our own database without validating it again.
+
+    Validation is what makes ``model(**row)`` slow (``EmailStr`` runs email_validator, for example)
+    and rows already satisfy the constraints of the table.
+    Only the fields of the model are taken from the row, so that extra columns such as
+    ``password_hash`` never end up in a response.
+    """
+    mapping = row._mapping if isinstance(row, Record) else row
+    values = {name: mapping[name] for name in model.__fields__}
+    return model.construct(set(values), **values)
+
+
+def from_rows(model: type[M], rows: Iterable[Record | asyncpg.Record]) -> list[M]:
+    return [from_row(model, row) for row in rows]
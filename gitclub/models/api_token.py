@@ -0,0 +1,86 @@
+from hashlib import sha256
+from secrets import token_urlsafe
+
+from pydantic import BaseModel
+from sqlalchemy import Column, ForeignKey, Integer, String, Table, bindparam
+
+from ..cache import invalidate
+from ..resources import db
+from ..statements import statement
+from . import from_row, from_rows, metadata, random_id
+from .user import User, UserInfo
+
+TOKEN_PREFIX = 'gc_'  # noqa: S105
+
+# Only the SHA-256 digest of a token is stored.
+# Tokens are random, so a fast unsalted hash is enough and makes the lookup a single
+# equality test on an indexed column. Timing differences of that lookup reveal nothing
+# about the token itself, only about its digest.
+ApiToken = Table(
+    'api_token',
+    metadata,
+    Column('id', Integer, primary_key=True, autoincrement=False),
+    Column('user_id', ForeignKey(User.c.id), nullable=False, index=True),
+    Column('name', String, nullable=False),
+    Column('digest', String(64), nullable=False, unique=True),
+)
+
+_get_user_by_digest = statement(
+    'api_token.get_user_by_digest',
+    User.select()
+    .select_from(User.join(ApiToken, ApiToken.c.user_id == User.c.id))
+    .where(ApiToken.c.digest == bindparam('digest')),
+)
+
+
+class ApiTokenInsert(BaseModel):
+    name: str
+
+
+class ApiTokenInfo(ApiTokenInsert):
+    id: int
+    user_id: int
+
+
+class ApiTokenCreated(ApiTokenInfo):
+    token: str
+
+
+def token_digest(token: str) -> str:
+    return sha256(token.encode()).hexdigest()
+
+
+async def insert(user_id: int, api_token: ApiTokenInsert) -> ApiTokenCreated:
+    """
+    Create a new token. The token itself is only known at this moment.
+    """
+    token = TOKEN_PREFIX + token_urlsafe(32)
+    fields = api_token.dict()
+    fields.update(id=random_id(), user_id=user_id, digest=token_digest(token))
+    stmt = ApiToken.insert().values(fields)
+    await db.execute(stmt)
+    return ApiTokenCreated(id=fields['id'], user_id=user_id, name=api_token.name, token=token)
+
+
+async def get_user_by_token(token: str) -> UserInfo | None:
+    result = await _get_user_by_digest.fetch_one(digest=token_digest(token))
+    return from_row(UserInfo, result) if result else None
+
+
+async def get_user_tokens(user_id: int) -> list[ApiTokenInfo]:
+    query = ApiToken.select().where(ApiToken.c.user_id == user_id)
+    result = await db.fetch_all(query)
+    return from_rows(ApiTokenInfo, result)
+
+
+async def delete(token_id: int, user_id: int) -> bool:
+    stmt = (
+        ApiToken.delete()
+        .where(ApiToken.c.id == token_id, ApiToken.c.user_id == user_id)
+        .returning(ApiToken.c.digest)
+    )
+    digest = await db.fetch_val(stmt)
+    if digest is None:
+        return False
+    await invalidate('api_token', digest)
+    return True
@@ -1,9 +1,14 @@
 from pydantic import BaseModel
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Table
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Table, bindparam, func
+from sqlalchemy.sql import ClauseElement, Select
 
+from ..entity_cache import EntityCache
+from ..pagination import Page
 from ..resources import db
-from . import metadata, random_id
+from ..statements import statement
+from . import from_rows, metadata, random_id
 from .repository import Repository
+from .repository import get as get_repository
 from .user import User
 
 Issue = Table(
@@ -13,7 +18,9 @@ Issue = Table(
     Column('title', String, nullable=False),
     Column('closed', Boolean, default=False),
     Column('repository_id', ForeignKey(Repository.c.id), nullable=False),
-    Column('creator_id', ForeignKey(User.c.id), nullable=False),
+    Column('creator_id', ForeignKey(User.c.id), nullable=False, index=True),
+    # issues of a repository in key order
+    Index('ix_issue_repository_id_id', 'repository_id', 'id'),
 )
 
 
@@ -34,6 +41,13 @@ class IssueInfo(IssueInsert):
     id: int
 
 
+_cache = EntityCache(
+    'issue',
+    IssueInfo,
+    statement('issue.get', Issue.select().where(Issue.c.id == func.any(bindparam('ids')))),
+)
+
+
 async def insert(issue: IssueInsert) -> int:
     fields = issue.dict()
     id_ = fields['id'] = random_id()
@@ -45,22 +59,35 @@ async def insert(issue: IssueInsert) -> int:
 async def get(
     issue_id: int, repository_id: int | None = None, organization_id: int | None = None
 ) -> IssueInfo | None:
-    query = Issue.select(Issue.c.id == issue_id)
-    if repository_id is not None:
-        query = query.where(Issue.c.repository_id == repository_id)
-        if organization_id is not None:
-            query = query.where(Repository.c.organization_id == organization_id)
-    result = await db.fetch_one(query)
-    return IssueInfo(**result._mapping) if result else None
-
-
-async def get_repository_issues(repository_id: int) -> list[IssueInfo]:
-    query = Issue.select(Issue.c.repository_id == repository_id)
+    issue = await _cache.get(issue_id)
+    if issue is None or repository_id not in (None, issue.repository_id):
+        return None
+    if organization_id is not None and not await get_repository(
+        issue.repository_id, organization_id
+    ):
+        return None
+    return issue
+
+
+def repository_issues_query(
+    repository_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> Select:
+    query = Issue.select().where(Issue.c.repository_id == repository_id, *criteria)
+    if page:
+        query = page.apply(query, Issue.c.id)
+    return query
+
+
+async def get_repository_issues(
+    repository_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> list[IssueInfo]:
+    query = repository_issues_query(repository_id, *criteria, page=page)
     results = await db.fetch_all(query)
-    return [IssueInfo(**result._mapping) for result in results]
+    return from_rows(IssueInfo, results)
 
 
 async def update(issue_id: int, patch: IssuePatch) -> None:
     fields = patch.dict(exclude_unset=True)
     stmt = Issue.update().where(Issue.c.id == issue_id).values(**fields)
     await db.execute(stmt)
+    await _cache.evict(issue_id)
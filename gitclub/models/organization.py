@@ -1,7 +1,9 @@
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String, Table
+from sqlalchemy import Column, Integer, String, Table, bindparam, func
 
+from ..entity_cache import EntityCache
 from ..resources import db
+from ..statements import statement
 from . import metadata, random_id
 
 Organization = Table(
@@ -24,6 +26,16 @@ class OrganizationInfo(OrganizationInsert):
     id: int
 
 
+_cache = EntityCache(
+    'organization',
+    OrganizationInfo,
+    statement(
+        'organization.get',
+        Organization.select().where(Organization.c.id == func.any(bindparam('ids'))),
+    ),
+)
+
+
 async def insert(organization: OrganizationInsert) -> int:
     fields = organization.dict()
     organization_id = fields['id'] = random_id()
@@ -33,6 +45,4 @@ async def insert(organization: OrganizationInsert) -> int:
 
 
 async def get(id_: int) -> OrganizationInfo | None:
-    query = Organization.select(Organization.c.id == id_)
-    result = await db.fetch_one(query)
-    return OrganizationInfo(**result._mapping) if result else None
+    return await _cache.get(id_)
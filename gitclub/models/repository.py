@@ -1,10 +1,26 @@
 from collections.abc import Sequence
 
 from pydantic import BaseModel
-from sqlalchemy import Column, ForeignKey, Integer, String, Table, UniqueConstraint, bindparam, text
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+    UniqueConstraint,
+    bindparam,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.sql import ClauseElement, Select
 
+from ..entity_cache import EntityCache
+from ..pagination import Page
 from ..resources import db
-from . import metadata, random_id
+from ..statements import statement
+from . import from_rows, metadata, random_id
 from .organization import Organization
 
 Repository = Table(
@@ -14,6 +30,8 @@ Repository = Table(
     Column('name', String),
     Column('organization_id', ForeignKey(Organization.c.id), nullable=False),
     UniqueConstraint('name', 'organization_id'),
+    # repositories of an organization in key order
+    Index('ix_repository_organization_id_id', 'organization_id', 'id'),
 )
 
 
@@ -29,6 +47,15 @@ class RepositoryInfo(RepositoryInsert2):
     id: int
 
 
+_cache = EntityCache(
+    'repository',
+    RepositoryInfo,
+    statement(
+        'repository.get', Repository.select().where(Repository.c.id == func.any(bindparam('ids')))
+    ),
+)
+
+
 async def insert(repository: RepositoryInsert) -> int:
     fields = repository.dict()
     id_ = fields['id'] = random_id()
@@ -38,19 +65,20 @@ async def insert(repository: RepositoryInsert) -> int:
 
 
 async def get(id: int, organization_id: int | None = None) -> RepositoryInfo | None:
-    query = Repository.select(Repository.c.id == id)
-    if organization_id is not None:
-        query = query.where(Repository.c.organization_id == organization_id)
-    result = await db.fetch_one(query)
-    return RepositoryInfo(**result._mapping) if result else None
+    repository = await _cache.get(id)
+    if repository is None or organization_id not in (None, repository.organization_id):
+        return None
+    return repository
 
 
 async def get_allowed_repositories(
     user_id: int,
     org_roles: Sequence[str],
     repo_roles: Sequence[str],
+    *criteria: ClauseElement,
+    page: Page | None = None,
 ) -> list[RepositoryInfo]:
-    query = text(
+    union = text(
         """\
     select
         r.id, r.name, r.organization_id
@@ -78,11 +106,29 @@ union
         bindparam('org_roles', value=org_roles, expanding=True),
         user_id=user_id,
     )
+    allowed = union.columns(*Repository.c).subquery('allowed')
+    query = select(allowed)
+    if criteria:
+        # criteria are over the repository table
+        query = Repository.select().where(Repository.c.id.in_(select(allowed.c.id)), *criteria)
+    if page:
+        query = page.apply(query, query.selected_columns.id)
     result = await db.fetch_all(query)
-    return [RepositoryInfo(**row._mapping) for row in result]
+    return from_rows(RepositoryInfo, result)
+
 
+def organization_repositories_query(
+    organization_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> Select:
+    query = Repository.select().where(Repository.c.organization_id == organization_id, *criteria)
+    if page:
+        query = page.apply(query, Repository.c.id)
+    return query
 
-async def get_organization_repositories(organization_id: int) -> list[RepositoryInfo]:
-    query = Repository.select(Repository.c.organization_id == organization_id)
+
+async def get_organization_repositories(
+    organization_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> list[RepositoryInfo]:
+    query = organization_repositories_query(organization_id, *criteria, page=page)
     result = await db.fetch_all(query)
-    return [RepositoryInfo(**row._mapping) for row in result]
+    return from_rows(RepositoryInfo, result)
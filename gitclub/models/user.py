@@ -1,16 +1,19 @@
 import json
 
 from loguru import logger
-from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr, validator
-from sqlalchemy import Column, Integer, String, Table, Unicode
+from sqlalchemy import Column, Index, Integer, String, Table, Unicode, bindparam, func, or_
+from sqlalchemy.sql import Select
 
+from ..cache import invalidate
 from ..config import PASSWORD_MIN_LENGTH, PASSWORD_MIN_VARIETY
+from ..hashing import hasher
+from ..loader import Loader
+from ..pagination import Page
 from ..resources import db
-from . import metadata, random_id
-
-crypt_ctx = CryptContext(schemes=['argon2'])
-
+from ..sessions import revoke_sessions
+from ..statements import statement
+from . import from_row, from_rows, metadata, random_id
 
 User = Table(
     'user',
@@ -18,7 +21,24 @@ User = Table(
     Column('id', Integer, primary_key=True, autoincrement=False),
     Column('name', Unicode, nullable=False),
     Column('email', Unicode, nullable=False, unique=True),
-    Column('password_hash', String(97), nullable=False),
+    Column('password_hash', String(128), nullable=False),
+)
+# prefix search, see search()
+Index(
+    'ix_user_name_prefix',
+    func.lower(User.c.name).label('lower_name'),
+    postgresql_ops={'lower_name': 'text_pattern_ops'},
+)
+Index(
+    'ix_user_email_prefix',
+    func.lower(User.c.email).label('lower_email'),
+    postgresql_ops={'lower_email': 'text_pattern_ops'},
+)
+
+_get = statement('user.get', User.select().where(User.c.id == func.any(bindparam('ids'))))
+_loader = Loader('user', lambda ids: _get.fetch_all(ids=ids))
+_get_by_email = statement(
+    'user.get_by_email', User.select().where(User.c.email == bindparam('email'))
 )
 
 
@@ -55,39 +75,59 @@ class UserPatch(BaseModel):
     _password = validator('password', allow_reuse=True)(check_password)
 
 
-async def get_all() -> list[UserInfo]:
+def search(query: Select, prefix: str, limit: int) -> Select:
+    """
+    Restrict a query of users to the first ``limit`` ones, by name,
+    whose name or email starts with ``prefix``, ignoring case.
+    """
+    escaped = prefix.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    pattern = f'{escaped}%'
+    return (
+        query.where(
+            or_(func.lower(User.c.name).like(pattern), func.lower(User.c.email).like(pattern))
+        )
+        .order_by(func.lower(User.c.name), User.c.id)
+        .limit(limit)
+    )
+
+
+async def get_all(page: Page | None = None) -> list[UserInfo]:
     query = User.select()
+    if page:
+        query = page.apply(query, User.c.id)
     logger.debug(query)
     result = await db.fetch_all(query)
-    return [UserInfo(**r._mapping) for r in result]
+    return from_rows(UserInfo, result)
 
 
 async def get_user_by_email(email: str) -> UserInfo | None:
-    query = User.select(User.c.email == email)
-    logger.debug(query)
-    result = await db.fetch_one(query)
-    return UserInfo(**result._mapping) if result else None
+    result = await _get_by_email.fetch_one(email=email)
+    return from_row(UserInfo, result) if result else None
 
 
 async def get_user_by_login(email: str, password: str) -> UserInfo | None:
-    query = User.select(User.c.email == email)
-    result = await db.fetch_one(query)
-    if result and crypt_ctx.verify(password, result['password_hash']):
-        return UserInfo(**result._mapping)
-    return None
+    result = await _get_by_email.fetch_one(email=email)
+    if not result:
+        return None
+    valid, new_hash = await hasher.verify_and_update(password, result['password_hash'])
+    if not valid:
+        return None
+    if new_hash:  # hashed with outdated argon2 costs
+        stmt = User.update().where(User.c.id == result['id']).values(password_hash=new_hash)
+        await db.execute(stmt)
+    return from_row(UserInfo, result)
 
 
 async def get(user_id: int) -> UserInfo | None:
-    query = User.select(User.c.id == user_id)
-    result = await db.fetch_one(query)
-    return UserInfo(**result._mapping) if result else None
+    result = await _loader.load(user_id)
+    return from_row(UserInfo, result) if result else None
 
 
 async def insert(user: UserInsert) -> int:
     fields = user.dict()
     user_id = fields['id'] = random_id()
     password = fields.pop('password')
-    fields['password_hash'] = crypt_ctx.hash(password)
+    fields['password_hash'] = await hasher.hash(password)
     stmt = User.insert().values(fields)
     await db.execute(stmt)
     return user_id  # noqa: RET504
@@ -97,11 +137,24 @@ async def update(user_id: int, patch: UserPatch) -> None:
     fields = patch.dict(exclude_unset=True)
     if 'password' in fields:
         password = fields.pop('password')
-        fields['password_hash'] = crypt_ctx.hash(password)
+        fields['password_hash'] = await hasher.hash(password)
     stmt = User.update().where(User.c.id == user_id).values(**fields)
     await db.execute(stmt)
 
+    async def evict() -> None:
+        await invalidate('user', user_id)
+
+    # evicted before the commit, the user could be cached again as it still is
+    await db.after_commit(evict)
+
 
 async def delete(user_id: int) -> None:
     stmt = User.delete().where(User.c.id == user_id)
     await db.execute(stmt)
+
+    async def evict() -> None:
+        await revoke_sessions(f'user:{user_id}')
+        await invalidate('user', user_id)
+
+    # the sessions of a user whose deletion rolls back stay valid
+    await db.after_commit(evict)
@@ -1,10 +1,27 @@
+from collections.abc import Collection
+
 from pydantic import BaseModel
-from sqlalchemy import Column, ForeignKey, String, Table, and_, join
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Index,
+    String,
+    Table,
+    and_,
+    bindparam,
+    func,
+    join,
+    select,
+)
+from sqlalchemy.sql import ClauseElement, Select
 
+from ..pagination import Page
 from ..resources import db
-from . import metadata
+from ..role_cache import invalidate_role
+from ..statements import statement
+from . import from_rows, metadata
 from .organization import Organization, OrganizationInfo
-from .user import User, UserInfo
+from .user import User, UserInfo, search
 
 UserOrganization = Table(
     'user_organization',
@@ -12,6 +29,16 @@ UserOrganization = Table(
     Column('user_id', ForeignKey(User.c.id), primary_key=True),
     Column('organization_id', ForeignKey(Organization.c.id), primary_key=True),
     Column('role', String, nullable=False),
+    # members of an organization in key order
+    Index('ix_user_organization_organization_id_user_id', 'organization_id', 'user_id'),
+)
+
+_get_roles = statement(
+    'user_organization.get_roles',
+    select(UserOrganization.c.organization_id, UserOrganization.c.role).where(
+        UserOrganization.c.user_id == bindparam('user_id'),
+        UserOrganization.c.organization_id == func.any(bindparam('organization_ids')),
+    ),
 )
 
 
@@ -28,42 +55,58 @@ class OrganizationMemberInfo(UserInfo):
 async def insert(user_organization: UserOrganizationInfo) -> None:
     stmt = UserOrganization.insert().values(user_organization.dict())
     await db.execute(stmt)
+    await invalidate_role(
+        'organization', user_organization.user_id, user_organization.organization_id
+    )
 
 
 async def get_user_role_in_organization(user_id: int, organization_id: int) -> str | None:
-    stmt = UserOrganization.select().where(
-        UserOrganization.c.user_id == user_id,
-        UserOrganization.c.organization_id == organization_id,
-    )
-    result = await db.fetch_one(stmt)
-    return result['role'] if result else None
+    roles = await get_user_roles_in_organizations(user_id, [organization_id])
+    return roles.get(organization_id)
+
+
+async def get_user_roles_in_organizations(
+    user_id: int, organization_ids: Collection[int]
+) -> dict[int, str]:
+    result = await _get_roles.fetch_all(user_id=user_id, organization_ids=list(organization_ids))
+    return {row['organization_id']: row['role'] for row in result}
 
 
-async def get_user_organizations(user_id: int) -> list[OrganizationInfo]:
+async def get_user_organizations(user_id: int, page: Page | None = None) -> list[OrganizationInfo]:
     query = Organization.select().where(
         Organization.c.id == UserOrganization.c.organization_id,
         UserOrganization.c.user_id == user_id,
     )
+    if page:
+        query = page.apply(query, UserOrganization.c.organization_id)
     result = await db.fetch_all(query)
-    return [OrganizationInfo(**row._mapping) for row in result]
+    return from_rows(OrganizationInfo, result)
 
 
-async def get_organization_members(organization_id: int) -> list[OrganizationMemberInfo]:
-    query = """
-select
-    u.id, u.name, u.email, uo.role
-from
-    "user" u
-inner join
-    user_organization uo
-on
-    u.id = uo.user_id and uo.organization_id = :organization_id
-"""
-    result = await db.fetch_all(query, values={'organization_id': organization_id})
-    return [OrganizationMemberInfo(**row._mapping) for row in result]
+def organization_members_query(
+    organization_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> Select:
+    query = select(User.c.id, User.c.name, User.c.email, UserOrganization.c.role).where(
+        User.c.id == UserOrganization.c.user_id,
+        UserOrganization.c.organization_id == organization_id,
+        *criteria,
+    )
+    if page:
+        query = page.apply(query, UserOrganization.c.user_id)
+    return query
+
+
+async def get_organization_members(
+    organization_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> list[OrganizationMemberInfo]:
+    query = organization_members_query(organization_id, *criteria, page=page)
+    result = await db.fetch_all(query)
+    return from_rows(OrganizationMemberInfo, result)
 
 
-async def get_organization_non_members(organization_id: int) -> list[UserInfo]:
+def organization_non_members_query(
+    organization_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> Select:
     left_join = join(
         User,
         UserOrganization,
@@ -78,10 +121,28 @@ async def get_organization_non_members(organization_id: int) -> list[UserInfo]:
         .select_from(left_join)
         .where(
             UserOrganization.c.organization_id == None,  # noqa: E711
+            *criteria,
         )
     )
+    if page:
+        query = page.apply(query, User.c.id)
+    return query
+
+
+async def get_organization_non_members(
+    organization_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> list[UserInfo]:
+    query = organization_non_members_query(organization_id, *criteria, page=page)
+    result = await db.fetch_all(query)
+    return from_rows(UserInfo, result)
+
+
+async def search_organization_non_members(
+    organization_id: int, prefix: str, limit: int, *criteria: ClauseElement
+) -> list[UserInfo]:
+    query = search(organization_non_members_query(organization_id, *criteria), prefix, limit)
     result = await db.fetch_all(query)
-    return [UserInfo(**row._mapping) for row in result]
+    return from_rows(UserInfo, result)
 
 
 async def update_user_organization(user_id: int, organization_id: int, role: str) -> None:
@@ -94,6 +155,7 @@ async def update_user_organization(user_id: int, organization_id: int, role: str
         .values(role=role)
     )
     await db.execute(stmt)
+    await invalidate_role('organization', user_id, organization_id)
 
 
 async def delete_user_organization(user_id: int, organization_id: int) -> None:
@@ -102,3 +164,4 @@ async def delete_user_organization(user_id: int, organization_id: int) -> None:
         UserOrganization.c.organization_id == organization_id,
     )
     await db.execute(stmt)
+    await invalidate_role('organization', user_id, organization_id)
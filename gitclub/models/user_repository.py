@@ -1,10 +1,16 @@
+from collections.abc import Collection
+
 from pydantic import BaseModel
-from sqlalchemy import Column, ForeignKey, String, Table
+from sqlalchemy import Column, ForeignKey, Index, String, Table, and_, bindparam, join, select, text
+from sqlalchemy.sql import ClauseElement, Select
 
+from ..pagination import Page
 from ..resources import db
-from . import metadata
+from ..role_cache import invalidate_role
+from ..statements import statement
+from . import from_rows, metadata
 from .repository import Repository
-from .user import User, UserInfo
+from .user import User, UserInfo, search
 
 UserRepository = Table(
     'user_repository',
@@ -12,6 +18,38 @@ UserRepository = Table(
     Column('user_id', ForeignKey(User.c.id), primary_key=True),
     Column('repository_id', ForeignKey(Repository.c.id), primary_key=True),
     Column('role', String, nullable=False),
+    # members of a repository in key order
+    Index('ix_user_repository_repository_id_user_id', 'repository_id', 'user_id'),
+)
+
+_get_role = statement(
+    'user_repository.get_role',
+    select(UserRepository.c.role).where(
+        UserRepository.c.user_id == bindparam('user_id'),
+        UserRepository.c.repository_id == bindparam('repository_id'),
+    ),
+)
+# roles in the repositories and in their organizations
+_get_roles = statement(
+    'user_repository.get_roles',
+    text(
+        """
+select
+    r.id, ur.role as repository_role, uo.role as organization_role
+from
+    repository r
+left join
+    user_repository ur
+on
+    ur.repository_id = r.id and ur.user_id = :user_id
+left join
+    user_organization uo
+on
+    uo.organization_id = r.organization_id and uo.user_id = :user_id
+where
+    r.id = any(:repository_ids)
+"""
+    ),
 )
 
 
@@ -28,53 +66,98 @@ class RepositoryMemberInfo(UserInfo):
 async def insert(user_repository: UserRepositoryInfo) -> None:
     stmt = UserRepository.insert().values(user_repository.dict())
     await db.execute(stmt)
+    await invalidate_role('repository', user_repository.user_id, user_repository.repository_id)
 
 
 async def get_user_role_in_repository(user_id: int, repository_id: int) -> str | None:
-    stmt = UserRepository.select().where(
-        UserRepository.c.user_id == user_id,
-        UserRepository.c.repository_id == repository_id,
-    )
-    result = await db.fetch_one(stmt)
-    return result['role'] if result else None
+    return await _get_role.fetch_val(user_id=user_id, repository_id=repository_id)
+
+
+async def get_user_roles_in_repositories(
+    user_id: int, repository_ids: Collection[int]
+) -> dict[int, tuple[str | None, str | None]]:
+    """
+    Return the roles of the user in each repository and in the repository's organization,
+    in a single query.
+    """
+    rows = await _get_roles.fetch_all(user_id=user_id, repository_ids=list(repository_ids))
+    roles = {row['id']: (row['repository_role'], row['organization_role']) for row in rows}
+    return {id_: roles.get(id_, (None, None)) for id_ in repository_ids}
 
 
-async def get_user_repositories(user_id: int) -> list[Repository]:
+async def get_user_roles_in_repository(
+    user_id: int, repository_id: int
+) -> tuple[str | None, str | None]:
+    roles = await get_user_roles_in_repositories(user_id, [repository_id])
+    return roles[repository_id]
+
+
+async def get_user_repositories(user_id: int) -> list[UserRepositoryInfo]:
     stmt = UserRepository.select().where(UserRepository.c.user_id == user_id)
     result = await db.fetch_all(stmt)
-    return [Repository(**row._mapping) for row in result]
+    return from_rows(UserRepositoryInfo, result)
 
 
-async def get_repository_non_members(repository_id: int) -> list[UserInfo]:
-    query = """
-select
-    u.id, u.name, u.email
-from
-    "user" u
-left join
-    user_repository ur
-on
-    u.id = ur.user_id and ur.repository_id = :repository_id
-where
-    ur.user_id is null
-"""
-    result = await db.fetch_all(query, values={'repository_id': repository_id})
-    return [UserInfo(**row._mapping) for row in result]
+def repository_non_members_query(
+    repository_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> Select:
+    left_join = join(
+        User,
+        UserRepository,
+        and_(
+            User.c.id == UserRepository.c.user_id,
+            UserRepository.c.repository_id == repository_id,
+        ),
+        isouter=True,
+    )
+    query = (
+        select(User.c.id, User.c.name, User.c.email)
+        .select_from(left_join)
+        .where(
+            UserRepository.c.user_id == None,  # noqa: E711
+            *criteria,
+        )
+    )
+    if page:
+        query = page.apply(query, User.c.id)
+    return query
 
 
-async def get_repository_members(repository_id: int) -> list[RepositoryMemberInfo]:
-    query = """
-select
-    u.id, u.name, u.email, ur.role
-from
-    "user" u
-inner join
-    user_repository ur
-on
-    u.id = ur.user_id and ur.repository_id = :repository_id
-"""
-    result = await db.fetch_all(query, values={'repository_id': repository_id})
-    return [RepositoryMemberInfo(**row._mapping) for row in result]
+async def get_repository_non_members(
+    repository_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> list[UserInfo]:
+    query = repository_non_members_query(repository_id, *criteria, page=page)
+    result = await db.fetch_all(query)
+    return from_rows(UserInfo, result)
+
+
+async def search_repository_non_members(
+    repository_id: int, prefix: str, limit: int, *criteria: ClauseElement
+) -> list[UserInfo]:
+    query = search(repository_non_members_query(repository_id, *criteria), prefix, limit)
+    result = await db.fetch_all(query)
+    return from_rows(UserInfo, result)
+
+
+def repository_members_query(
+    repository_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> Select:
+    query = select(User.c.id, User.c.name, User.c.email, UserRepository.c.role).where(
+        User.c.id == UserRepository.c.user_id,
+        UserRepository.c.repository_id == repository_id,
+        *criteria,
+    )
+    if page:
+        query = page.apply(query, UserRepository.c.user_id)
+    return query
+
+
+async def get_repository_members(
+    repository_id: int, *criteria: ClauseElement, page: Page | None = None
+) -> list[RepositoryMemberInfo]:
+    query = repository_members_query(repository_id, *criteria, page=page)
+    result = await db.fetch_all(query)
+    return from_rows(RepositoryMemberInfo, result)
 
 
 async def update_user_repository(user_id: int, repository_id: int, role: str) -> None:
@@ -87,6 +170,7 @@ async def update_user_repository(user_id: int, repository_id: int, role: str) ->
         .values(role=role)
     )
     await db.execute(stmt)
+    await invalidate_role('repository', user_id, repository_id)
 
 
 async def delete_user_repository(user_id: int, repository_id: int) -> None:
@@ -95,3 +179,4 @@ async def delete_user_repository(user_id: int, repository_id: int) -> None:
         UserRepository.c.repository_id == repository_id,
     )
     await db.execute(stmt)
+    await invalidate_role('repository', user_id, repository_id)
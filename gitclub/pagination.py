@@ -0,0 +1,76 @@
+"""
+Keyset pagination of the list endpoints.
+
+Items are ordered by a unique key (their id) and a page starts right after the last key
+of the previous page, so any page costs an index range scan, however deep it is.
+The position is handed to clients as an opaque cursor,
+in the ``after`` parameter of the URL of the ``Link: <...>; rel="next"`` header.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Callable
+from operator import attrgetter
+from typing import Annotated, Any, TypeVar
+
+from fastapi import Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.sql import ColumnElement, Select
+
+from . import config
+
+T = TypeVar('T')
+
+
+def encode_cursor(key: int) -> str:
+    return urlsafe_b64encode(str(key).encode()).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Raise ValueError if the cursor was not created by encode_cursor.
+    """
+    return int(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+
+
+class Page:
+    def __init__(self, limit: int, after: int | None = None, stream: bool = False) -> None:
+        self.limit = limit
+        self.after = after
+        # every item is wanted at once, see streaming.stream_json
+        self.stream = stream
+
+    def apply(self, query: Select, key: ColumnElement) -> Select:
+        if self.after is not None:
+            query = query.where(key > self.after)
+        # one extra row tells whether there is a next page
+        return query.order_by(key).limit(self.limit + 1)
+
+
+def get_page(
+    limit: int = Query(config.PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    after: str | None = Query(None, description='Cursor of the Link header'),
+    stream: bool = Query(False, description='Stream every item, ignoring limit and after'),
+) -> Page:
+    try:
+        return Page(limit, decode_cursor(after) if after else None, stream)
+    except ValueError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail='Invalid cursor') from None
+
+
+PageParams = Annotated[Page, Depends(get_page)]
+
+
+def paginate(
+    items: list[T],
+    page: Page,
+    request: Request,
+    response: Response,
+    key: Callable[[T], Any] = attrgetter('id'),
+) -> list[T]:
+    """
+    Drop the extra item fetched by Page.apply and link to the next page if there is one.
+    """
+    if len(items) <= page.limit:
+        return items
+    items = items[: page.limit]
+    url = request.url.include_query_params(limit=page.limit, after=encode_cursor(key(items[-1])))
+    response.headers['Link'] = f'<{url}>; rel="next"'
+    return items
@@ -0,0 +1,110 @@
+"""
+Read-your-writes routing of reads to the replicas of config.DATABASE_REPLICA_URLS.
+
+Within an HTTP request, reads made outside a transaction go to a replica,
+unless the client wrote something less than REPLICA_STICKINESS seconds ago:
+a request that writes sets the ``primary_until`` cookie
+and the requests carrying it keep reading from the primary until then,
+so users see their own changes despite the replication lag.
+Clients that don't keep cookies only read their own writes within the same request.
+
+Outside of a request (scripts, startup), everything goes to the primary.
+"""
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import config
+
+COOKIE = 'primary_until'
+
+
+class ReadYourWrites:
+    def __init__(self, primary_until: float = 0) -> None:
+        # unix time until which reads stay on the primary
+        self.primary_until = primary_until
+        self.wrote = False
+
+    @property
+    def use_primary(self) -> bool:
+        return self.wrote or time.time() < self.primary_until
+
+
+_read_your_writes: ContextVar[ReadYourWrites | None] = ContextVar('read_your_writes', default=None)
+
+
+def use_replica() -> bool:
+    state = _read_your_writes.get()
+    return state is not None and not state.use_primary
+
+
+def record_write() -> None:
+    if (state := _read_your_writes.get()) is not None:
+        state.wrote = True
+
+
+@contextmanager
+def read_your_writes(primary_until: float = 0) -> Iterator[ReadYourWrites]:
+    """
+    Let the reads within the block go to a replica until the first write.
+    """
+    state = ReadYourWrites(primary_until)
+    token = _read_your_writes.set(state)
+    try:
+        yield state
+    finally:
+        _read_your_writes.reset(token)
+
+
+@contextmanager
+def primary() -> Iterator[None]:
+    """
+    Send the reads within the block to the primary.
+    """
+    token = _read_your_writes.set(None)
+    try:
+        yield
+    finally:
+        _read_your_writes.reset(token)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Route the reads of each request and pin the clients that write to the primary.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not config.DATABASE_REPLICA_URLS:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            primary_until = float(HTTPConnection(scope).cookies.get(COOKIE, 0))
+        except ValueError:
+            primary_until = 0
+        # the cookie can't pin a client to the primary for longer than the window
+        if primary_until > time.time() + config.REPLICA_STICKINESS:
+            primary_until = 0
+
+        with read_your_writes(primary_until) as state:
+
+            async def send_wrapper(message: Message) -> None:
+                if message['type'] == 'http.response.start' and state.wrote:
+                    # in whole milliseconds, rounded down to stay within the window
+                    until = int((time.time() + config.REPLICA_STICKINESS) * 1000)
+                    cookie = (
+                        f'{COOKIE}={until / 1000:.3f}; Max-Age={config.REPLICA_STICKINESS}; '
+                        'Path=/; HttpOnly; Secure; SameSite=lax'
+                    )
+                    headers = message.setdefault('headers', [])
+                    headers.append((b'set-cookie', cookie.encode()))
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -1,24 +1,245 @@
 import asyncio
+import functools
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, Awaitable, Callable, Mapping, Sequence
+from itertools import cycle
+from statistics import quantiles
+from typing import Any, TypeVar, cast
 
+from asyncpg import Pool
 from databases import Database
+from databases.backends.postgres import PostgresBackend, PostgresConnection
+from databases.core import Transaction
+from databases.interfaces import Record
 from loguru import logger
 from redis.asyncio import Redis
+from sqlalchemy.sql import ClauseElement
 from tenacity import RetryError, retry, stop_after_delay, wait_exponential
 
-from . import config
+from . import config, metrics
+from .replicas import record_write, use_replica
 
-db = Database(config.DATABASE_URL, force_rollback=config.TESTING)
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+class DatabaseBusyError(Exception):
+    """
+    No connection of the pool was released within config.DB_ACQUIRE_TIMEOUT.
+    """
+
+
+class PoolBackend(PostgresBackend):
+    """
+    The asyncpg pool of ``databases``, configured by gitclub.config
+    and with the time spent waiting for a connection measured.
+    """
+
+    _pool: Pool | None
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.acquisitions = 0
+        self.waiting = 0
+        self.timeouts = 0
+        self.waits: deque[float] = deque(maxlen=1000)
+
+    def _get_connection_kwargs(self) -> dict:
+        kwargs = super()._get_connection_kwargs()
+        kwargs.update(
+            min_size=config.DB_POOL_MIN_SIZE,
+            max_size=config.DB_POOL_MAX_SIZE,
+            max_queries=config.DB_MAX_QUERIES,
+            max_inactive_connection_lifetime=config.DB_MAX_INACTIVE_LIFETIME,
+            statement_cache_size=config.DB_STATEMENT_CACHE_SIZE,
+        )
+        return kwargs
+
+    def connection(self) -> 'PoolConnection':
+        return PoolConnection(self, self._dialect)
+
+    def stats(self) -> dict[str, Any]:
+        waits = list(self.waits)
+        p50 = p99 = None
+        if len(waits) > 1:
+            percentiles = quantiles(waits, n=100)
+            p50, p99 = percentiles[49], percentiles[98]
+        size = idle = 0
+        if self._pool is not None:
+            size, idle = self._pool.get_size(), self._pool.get_idle_size()
+        return {
+            'min_size': config.DB_POOL_MIN_SIZE,
+            'max_size': config.DB_POOL_MAX_SIZE,
+            'size': size,
+            'in_use': size - idle,
+            'waiting': self.waiting,
+            'acquisitions': self.acquisitions,
+            'timeouts': self.timeouts,
+            'wait_p50_ms': p50,
+            'wait_p99_ms': p99,
+        }
+
+
+class PoolConnection(PostgresConnection):
+    _database: PoolBackend
+
+    async def acquire(self) -> None:
+        backend = self._database
+        if backend._pool is None:
+            raise RuntimeError('DatabaseBackend is not running')
+        backend.waiting += 1
+        start = time.perf_counter()
+        try:
+            self._connection = await backend._pool.acquire(timeout=config.DB_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            backend.timeouts += 1
+            raise DatabaseBusyError() from None
+        finally:
+            backend.waiting -= 1
+            backend.waits.append((time.perf_counter() - start) * 1000)
+        backend.acquisitions += 1
+
+
+class PoolTransaction(Transaction):
+    """
+    A transaction that runs the callbacks registered by ``PoolDatabase.after_commit``
+    once what it wrote is committed: callbacks of a nested transaction are passed on to
+    the enclosing one, and those of a transaction that rolls back are dropped.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.callbacks: list[Callable[[], Awaitable[None]]] = []
+
+    def __call__(self, func: F) -> F:
+        # a decorated function is called by concurrent requests, each in a transaction of its own
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            transaction = PoolTransaction(
+                self._connection_callable, self._force_rollback, **self._extra_options
+            )
+            async with transaction:
+                return await func(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    async def commit(self) -> None:
+        await super().commit()
+        callbacks, self.callbacks = self.callbacks, []
+        stack = self._connection._transaction_stack
+        if stack and isinstance(stack[-1], PoolTransaction):
+            stack[-1].callbacks.extend(callbacks)
+            return
+        for callback in callbacks:
+            await callback()
+
+    async def rollback(self) -> None:
+        self.callbacks = []
+        await super().rollback()
+
+
+class PoolDatabase(Database):
+    """
+    The primary database, which routes reads to its replicas as gitclub.replicas decides.
+    Reads within a transaction always go to the primary.
+    """
+
+    SUPPORTED_BACKENDS = {
+        **Database.SUPPORTED_BACKENDS,
+        'postgresql': 'gitclub.resources:PoolBackend',
+    }
+
+    def __init__(self, url: str, *, replica_urls: Sequence[str] = (), **options: Any) -> None:
+        super().__init__(url, **options)
+        self.replicas = [PoolDatabase(replica_url) for replica_url in replica_urls]
+        self._next_replicas = cycle(self.replicas)
+
+    def in_transaction(self) -> bool:
+        """
+        Whether the current task is within a transaction, besides the one of force_rollback.
+        """
+        connection = self.connection()
+        return len(connection._transaction_stack) > (connection is self._global_connection)
+
+    def transaction(self, *, force_rollback: bool = False, **kwargs: Any) -> PoolTransaction:
+        return PoolTransaction(self.connection, force_rollback=force_rollback, **kwargs)
+
+    async def after_commit(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """
+        Await ``callback`` once the transaction of the current task commits,
+        or right away outside of a transaction.
+        """
+        stack = self.connection()._transaction_stack
+        if stack and isinstance(stack[-1], PoolTransaction):
+            stack[-1].callbacks.append(callback)
+        else:
+            await callback()
+
+    def reader(self) -> Database:
+        """
+        The database to read from: the replicas in turn, or the primary itself.
+        """
+        if not self.replicas or not use_replica() or self.connection()._transaction_stack:
+            return self
+        return next(self._next_replicas)
+
+    async def fetch_all(
+        self, query: ClauseElement | str, values: dict | None = None
+    ) -> list[Record]:
+        async with self.reader().connection() as connection:
+            return await connection.fetch_all(query, values)
+
+    async def fetch_one(
+        self, query: ClauseElement | str, values: dict | None = None
+    ) -> Record | None:
+        async with self.reader().connection() as connection:
+            return await connection.fetch_one(query, values)
+
+    async def fetch_val(
+        self, query: ClauseElement | str, values: dict | None = None, column: Any = 0
+    ) -> Any:
+        async with self.reader().connection() as connection:
+            return await connection.fetch_val(query, values, column=column)
+
+    async def iterate(
+        self, query: ClauseElement | str, values: dict | None = None
+    ) -> AsyncGenerator[Mapping, None]:
+        async with self.reader().connection() as connection:
+            async for record in connection.iterate(query, values):
+                yield record
+
+    async def execute(self, query: ClauseElement | str, values: dict | None = None) -> Any:
+        record_write()
+        return await super().execute(query, values)
+
+    async def execute_many(self, query: ClauseElement | str, values: list) -> None:
+        record_write()
+        await super().execute_many(query, values)
+
+
+db = PoolDatabase(
+    config.DATABASE_URL,
+    replica_urls=config.DATABASE_REPLICA_URLS,
+    force_rollback=config.TESTING,
+)
 redis = Redis.from_url(config.REDIS_URL)
+metrics.register('db_pool', cast(PoolBackend, db._backend).stats)
+for i, replica in enumerate(db.replicas):
+    metrics.register(f'db_replica_pool_{i}', cast(PoolBackend, replica._backend).stats)
 
 
 async def startup() -> None:
     show_config()
-    await asyncio.gather(connect_redis(), connect_database(db))
+    await asyncio.gather(
+        connect_redis(), connect_database(db), *(connect_database(r) for r in db.replicas)
+    )
     logger.info('started...')
 
 
 async def shutdown() -> None:
-    await asyncio.gather(disconnect_redis(), db.disconnect())
+    await asyncio.gather(
+        disconnect_redis(), db.disconnect(), *(replica.disconnect() for replica in db.replicas)
+    )
     logger.info('...shutdown')
 
 
@@ -0,0 +1,43 @@
+"""
+JSON responses that skip the validation of the response model.
+
+FastAPI validates the result of a handler against its response model again,
+converts it with jsonable_encoder and only then serializes it.
+The models built by gitclub.models already hold typed values of our own database,
+so ``trusted_json`` encodes them directly with orjson.
+The handler keeps ``response_model`` in its route, so the OpenAPI schema doesn't change.
+
+Fields are not filtered by the response model anymore:
+only return models whose fields are exactly the ones of the response model.
+"""
+from typing import Any
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise TypeError
+
+
+def trusted_json(content: Any, response: Response | None = None) -> Response:
+    """
+    Encode content made of models, lists and dicts.
+    The status code and headers set in ``response``, the one injected into the handler, are kept.
+    """
+    body = orjson.dumps(content, default=_default)
+    if response is None:
+        return Response(body, media_type='application/json')
+    return Response(
+        body,
+        status_code=response.status_code or 200,
+        headers={
+            key: value
+            for key, value in response.headers.items()
+            if key not in ('content-length', 'content-type')
+        },
+        media_type='application/json',
+    )
@@ -0,0 +1,170 @@
+"""
+Cache of the roles of users in organizations and repositories.
+
+Roles are needed by almost every request but rarely change,
+and only through the functions of ``models.user_organization`` and ``models.user_repository``,
+which call ``invalidate_role``.
+
+Every worker keeps the roles it resolved in memory.
+When ``config.ROLE_CACHE_REDIS`` is set, they are also shared through Redis,
+in a hash ``roles:{user_id}`` per user, so that a worker doesn't query the database
+for roles another worker already knows.
+
+Roles are evicted once the transaction that changed them commits, and the cache
+is neither read nor filled within a transaction, so that a role is never cached
+from a transaction that could still change it or roll back.
+
+Each invalidation also increments the version ``roles-version:{user_id}`` of the user,
+and roles read from the database are only written to Redis if the version is still
+the one read before the query, so that a worker can't write back a role
+that another worker invalidated in the meantime.
+When Redis is unavailable, roles are read from the local cache and the database only.
+
+Missing roles (``None``) are cached as well.
+The cached role of a repository is the pair (repository role, organization role),
+so changing a role in an organization also evicts the repository roles of the user.
+"""
+import asyncio
+from collections.abc import Collection
+from typing import Any
+
+import orjson
+from loguru import logger
+from redis.exceptions import RedisError
+
+from . import config
+from .autopipeline import autopipeline
+from .cache import LRUCache, invalidate, on_invalidate
+from .resources import db, redis
+
+MISSING: Any = object()
+# the local generation and the Redis version of the roles of a user, or None without Redis
+Stamp = tuple[int, bytes | None]
+
+# writes the roles ARGV[3:] to the hash KEYS[2] if the version KEYS[1] is still ARGV[1]
+_set_if_version = redis.register_script(
+    """
+    if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+        return 0
+    end
+    redis.call('HSET', KEYS[2], unpack(ARGV, 3))
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+    return 1
+    """
+)
+
+
+def _redis_key(user_id: int) -> str:
+    return f'roles:{user_id}'
+
+
+def _version_key(user_id: int) -> str:
+    return f'roles-version:{user_id}'
+
+
+def _decode(value: bytes) -> Any:
+    role = orjson.loads(value)
+    return tuple(role) if isinstance(role, list) else role
+
+
+class RoleCache:
+    def __init__(self, maxsize: int, ttl: int, shared: bool) -> None:
+        self.local: LRUCache[tuple[str, int, int], Any] = LRUCache('role', maxsize, ttl)
+        self.ttl = ttl
+        self.shared = shared
+        # incremented by each invalidation, so that a role read from the database
+        # before an invalidation is not cached after it
+        self.generation = 0
+
+    async def get_many(
+        self, kind: str, user_id: int, resource_ids: Collection[int]
+    ) -> tuple[dict[int, Any], Stamp]:
+        """
+        Return the cached roles, which might be None, of the user in the resources,
+        and the stamp to cache the others with once read from the database.
+        Roles not cached are left out.
+        """
+        generation = self.generation
+        if db.in_transaction():
+            return {}, (generation, None)
+        roles = {}
+        for id_ in resource_ids:
+            if (role := self.local.get((kind, user_id, id_), MISSING)) is not MISSING:
+                roles[id_] = role
+        missing = [id_ for id_ in resource_ids if id_ not in roles]
+        version = None
+        if missing and self.shared:
+            fields = [f'{kind}:{id_}' for id_ in missing]
+            try:
+                values, version = await asyncio.gather(
+                    autopipeline.execute('HMGET', _redis_key(user_id), *fields),
+                    autopipeline.execute('GET', _version_key(user_id)),
+                )
+            except (RedisError, OSError) as error:
+                logger.warning(f'Could not read roles from Redis: {error}')
+            else:
+                version = version or b''
+                for id_, value in zip(missing, values, strict=True):
+                    if value is not None:
+                        roles[id_] = _decode(value)
+                        self.local.set((kind, user_id, id_), roles[id_])
+        return roles, (generation, version)
+
+    async def set_many(self, kind: str, user_id: int, roles: dict[int, Any], stamp: Stamp) -> None:
+        """
+        Cache roles read from the database after ``get_many`` returned ``stamp``.
+        """
+        generation, version = stamp
+        if generation != self.generation or not roles or db.in_transaction():
+            return
+        for id_, role in roles.items():
+            self.local.set((kind, user_id, id_), role)
+        if self.shared and version is not None:
+            fields: list[str | bytes] = []
+            for id_, role in roles.items():
+                fields += (f'{kind}:{id_}', orjson.dumps(role))
+            try:
+                await _set_if_version(
+                    keys=[_version_key(user_id), _redis_key(user_id)],
+                    args=[version, self.ttl, *fields],
+                )
+            except (RedisError, OSError) as error:
+                logger.warning(f'Could not write roles to Redis: {error}')
+
+    def discard(self, key: str) -> None:
+        """
+        Evict ``{kind}:{user_id}:{resource_id}`` from the local cache.
+        """
+        kind, user_id, resource_id = key.split(':')
+        self.generation += 1
+        self.local.pop((kind, int(user_id), int(resource_id)))
+        if kind == 'organization':
+            id_ = int(user_id)
+            self.local.discard_if(lambda k, _: k[0] == 'repository' and k[1] == id_)
+
+
+role_cache = RoleCache(config.ROLE_CACHE_SIZE, config.ROLE_CACHE_TTL, config.ROLE_CACHE_REDIS)
+on_invalidate('role', role_cache.discard)
+
+
+async def invalidate_role(kind: str, user_id: int, resource_id: int) -> None:
+    """
+    Evict the role of a user in an organization or repository from every worker and from Redis,
+    once the current transaction commits: evicted before, the role could be cached again
+    by a concurrent request from what is still committed.
+    """
+
+    async def evict() -> None:
+        if role_cache.shared:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.incr(_version_key(user_id))
+                # forgotten with the roles written before it
+                pipe.expire(_version_key(user_id), role_cache.ttl)
+                if kind == 'organization':
+                    pipe.delete(_redis_key(user_id))
+                else:
+                    pipe.hdel(_redis_key(user_id), f'{kind}:{resource_id}')
+                await pipe.execute()
+        await invalidate('role', f'{kind}:{user_id}:{resource_id}')
+
+    await db.after_commit(evict)
@@ -1,34 +1,45 @@
-from fastapi import APIRouter, Response
+from fastapi import APIRouter, Request, Response
 
-from ..authorization import check_authz
+from ..authorization import authorization_filter, check_authz
 from ..dependantions import CurrentUser, TargetIssue, TargetRepository
 from ..models.issue import (
+    Issue,
     IssueInfo,
     IssueInsert,
     IssuePatch,
     get,
     get_repository_issues,
     insert,
+    repository_issues_query,
     update,
 )
+from ..pagination import PageParams, paginate
 from ..resources import db
+from ..responses import trusted_json
+from ..streaming import stream_json
 
 router = APIRouter(
     prefix='/organizations/{organization_id}/repositories/{repository_id}/issues', tags=['issues']
 )
 
 
-@router.get('')
+@router.get('', response_model=list[IssueInfo])
 async def list_issues(
+    request: Request,
+    response: Response,
     repos: TargetRepository,
     current_user: CurrentUser,
-) -> list[IssueInfo]:
+    page: PageParams,
+) -> list[IssueInfo] | Response:
     """
-    List all issues of a repository.
+    List the issues of a repository, a page at a time.
     """
     await check_authz(current_user, 'list_issues', repos)
-    issues = await get_repository_issues(repos.id)
-    return list(issues)  # no extra authz check needed
+    criteria = authorization_filter(current_user, 'read', Issue)
+    if page.stream:
+        return stream_json(repository_issues_query(repos.id, criteria), IssueInfo)
+    issues = await get_repository_issues(repos.id, criteria, page=page)
+    return trusted_json(paginate(issues, page, request, response), response)
 
 
 @router.post('', status_code=201)
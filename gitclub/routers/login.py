@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Cookie, HTTPException, Response
+from fastapi import APIRouter, Cookie, HTTPException, Response, status
 from pydantic import BaseModel, EmailStr
 
+from ..hashing import HashingBusyError
 from ..models.user import UserInfo, get_user_by_login
 from ..sessions import create_csrf, create_session, delete_session
 
@@ -16,7 +17,14 @@ class LoginInfo(BaseModel):
 async def login(rec: LoginInfo, response: Response, session_id: str = Cookie(None)) -> UserInfo:
     if session_id:
         await delete_session(session_id)
-    user = await get_user_by_login(rec.email, rec.password)
+    try:
+        user = await get_user_by_login(rec.email, rec.password)
+    except HashingBusyError:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='too many login attempts in progress',
+            headers={'Retry-After': '1'},
+        ) from None
     if user is None:
         raise HTTPException(status_code=404, detail='invalid email or password')
     session_id = await create_session(f'user:{user.id}')
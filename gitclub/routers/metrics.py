@@ -0,0 +1,30 @@
+import hmac
+from typing import Any
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from .. import config
+from ..metrics import collect
+
+router = APIRouter()
+
+
+async def metrics_access(authorization: str = Header(None)) -> None:
+    """
+    The metrics are internal: only clients holding config.METRICS_TOKEN can read them.
+    """
+    if not config.METRICS_TOKEN:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(
+        token.encode(), config.METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED)
+
+
+@router.get('/metrics', dependencies=[Depends(metrics_access)])
+async def get_metrics() -> dict[str, dict[str, Any]]:
+    """
+    Internal counters such as cache hits and misses.
+    """
+    return collect()
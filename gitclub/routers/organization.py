@@ -1,12 +1,13 @@
 from asyncpg.exceptions import UniqueViolationError
-from fastapi import APIRouter, Body, HTTPException, Response, status
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response, status
 
+from .. import config
 from ..authentication import CurrentUser
-from ..authorization import authorized, check_authz, check_resource_role
+from ..authorization import authorization_filter, check_authz, check_resource_role
 from ..dependantions import TargetOrganization
 from ..models import organization, user
 from ..models.organization import Organization, OrganizationInfo, OrganizationInsert
-from ..models.user import UserInfo
+from ..models.user import User, UserInfo
 from ..models.user_organization import (
     OrganizationMemberInfo,
     UserOrganizationInfo,
@@ -15,25 +16,35 @@ from ..models.user_organization import (
     get_organization_non_members,
     get_user_organizations,
     get_user_role_in_organization,
+    organization_members_query,
+    organization_non_members_query,
+    search_organization_non_members,
     update_user_organization,
 )
 from ..models.user_organization import insert as insert_user_organization
+from ..pagination import PageParams, paginate
 from ..resources import db
+from ..responses import trusted_json
+from ..streaming import stream_json
 
 router = APIRouter(prefix='/organizations', tags=['organizations'])
 
 
-@router.get('')
+@router.get('', response_model=list[OrganizationInfo])
 async def list_organizations(
+    request: Request,
+    response: Response,
     current_user: CurrentUser,
-) -> list[OrganizationInfo]:
+    page: PageParams,
+) -> list[OrganizationInfo] | Response:
     """
-    List all organizations the user is a member of.
+    List the organizations the user is a member of, a page at a time.
     """
     # it doesn't make sense to check authorization for each organization the user is a member of
     # because if he/she is a member, he/she has read access to it at least
     # result = [org for org in organizations if await authorized(current_user, 'read', org)]  # noqa: ERA001, E501
-    return await get_user_organizations(current_user.id)
+    organizations = await get_user_organizations(current_user.id, page=page)
+    return trusted_json(paginate(organizations, page, request, response), response)
 
 
 @router.post('', status_code=201)
@@ -64,35 +75,60 @@ async def show(
 # gitclub/flask-alchemy/app/routes/role_assignment.py
 
 # was: /unassigned_users
-@router.get('/{organization_id}/non-members')
+@router.get('/{organization_id}/non-members', response_model=list[UserInfo])
 async def list_non_members(
+    request: Request,
+    response: Response,
+    org: TargetOrganization,
+    current_user: CurrentUser,
+    page: PageParams,
+) -> list[UserInfo] | Response:
+    """
+    List the users who aren't members of the organization, a page at a time.
+    """
+    await check_authz(current_user, 'list_role_assignments', org)
+    criteria = authorization_filter(current_user, 'read_profile', User)
+    if page.stream:
+        return stream_json(organization_non_members_query(org.id, criteria), UserInfo)
+    users = await get_organization_non_members(org.id, criteria, page=page)
+    return trusted_json(paginate(users, page, request, response), response)
+
+
+@router.get('/{organization_id}/non-members/search', response_model=list[UserInfo])
+async def search_non_members(
     org: TargetOrganization,
     current_user: CurrentUser,
-) -> list[UserInfo]:
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(config.SEARCH_LIMIT, ge=1, le=config.MAX_SEARCH_LIMIT),
+) -> list[UserInfo] | Response:
     """
-    List all users who aren't members of the organization.
+    Find the users who aren't members of the organization and whose name or email starts with q.
     """
     await check_authz(current_user, 'list_role_assignments', org)
-    users = await get_organization_non_members(org.id)
-    return [user for user in users if await authorized(current_user, 'read_profile', user)]
+    users = await search_organization_non_members(
+        org.id, q, limit, authorization_filter(current_user, 'read_profile', User)
+    )
+    return trusted_json(users)
 
 
 # was: /role_assignments
-@router.get('/{organization_id}/members')
+@router.get('/{organization_id}/members', response_model=list[OrganizationMemberInfo])
 async def list_members(
+    request: Request,
+    response: Response,
     org: TargetOrganization,
     current_user: CurrentUser,
-) -> list[OrganizationMemberInfo]:
+    page: PageParams,
+) -> list[OrganizationMemberInfo] | Response:
     """
-    List all members of the organization.
+    List the members of the organization, a page at a time.
     """
     await check_authz(current_user, 'list_role_assignments', org)
-    members = await get_organization_members(org.id)
-    return [
-        user
-        for user in members
-        if await authorized(current_user, 'read_profile', UserInfo(**user.dict()))
-    ]
+    criteria = authorization_filter(current_user, 'read_profile', User)
+    if page.stream:
+        return stream_json(organization_members_query(org.id, criteria), OrganizationMemberInfo)
+    members = await get_organization_members(org.id, criteria, page=page)
+    return trusted_json(paginate(members, page, request, response), response)
 
 
 # it was originally POST /role_assignments
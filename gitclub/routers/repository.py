@@ -1,16 +1,19 @@
 from asyncpg import UniqueViolationError
-from fastapi import APIRouter, Body, HTTPException, Response, status
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response, status
 
-from ..authorization import authorized, check_authz, check_resource_role
+from .. import config
+from ..authorization import authorization_filter, check_authz, check_resource_role
 from ..dependantions import CurrentUser, TargetOrganization, TargetRepository
 from ..models.repository import (
+    Repository,
     RepositoryInfo,
     RepositoryInsert,
     RepositoryInsert2,
     get_organization_repositories,
     insert,
+    organization_repositories_query,
 )
-from ..models.user import UserInfo
+from ..models.user import User, UserInfo
 from ..models.user import get as get_user
 from ..models.user_repository import (
     RepositoryMemberInfo,
@@ -19,25 +22,37 @@ from ..models.user_repository import (
     get_repository_members,
     get_repository_non_members,
     get_user_role_in_repository,
+    repository_members_query,
+    repository_non_members_query,
+    search_repository_non_members,
     update_user_repository,
 )
 from ..models.user_repository import insert as insert_user_repository
+from ..pagination import PageParams, paginate
 from ..resources import db
+from ..responses import trusted_json
+from ..streaming import stream_json
 
 router = APIRouter(prefix='/organizations/{organization_id}/repositories', tags=['repositories'])
 
 
-@router.get('')
+@router.get('', response_model=list[RepositoryInfo])
 async def list_repositories(
+    request: Request,
+    response: Response,
     org: TargetOrganization,
     current_user: CurrentUser,
-) -> list[RepositoryInfo]:
+    page: PageParams,
+) -> list[RepositoryInfo] | Response:
     """
-    List all repositories of a group.
+    List the repositories of a group, a page at a time.
     """
     await check_authz(current_user, 'list_repos', org)
-    repositories = await get_organization_repositories(org.id)
-    return [repo for repo in repositories if await authorized(current_user, 'read', repo)]
+    criteria = authorization_filter(current_user, 'read', Repository)
+    if page.stream:
+        return stream_json(organization_repositories_query(org.id, criteria), RepositoryInfo)
+    repositories = await get_organization_repositories(org.id, criteria, page=page)
+    return trusted_json(paginate(repositories, page, request, response), response)
 
 
 @router.post('', status_code=status.HTTP_201_CREATED)
@@ -74,30 +89,59 @@ async def show(
 # https://github.com/osohq/gitclub/blob/main/backends/flask-sqlalchemy/app/routes/role_assignments.py
 
 
-@router.get('/{repository_id}/non-members')
+@router.get('/{repository_id}/non-members', response_model=list[UserInfo])
 async def list_non_members(
+    request: Request,
+    response: Response,
     repository: TargetRepository,
     current_user: CurrentUser,
-) -> list[UserInfo]:
+    page: PageParams,
+) -> list[UserInfo] | Response:
     """
-    List all users who aren't members of the repository.
+    List the users who aren't members of the repository, a page at a time.
     """
     await check_authz(current_user, 'list_role_assignments', repository)
-    users = await get_repository_non_members(repository.id)
-    return [user for user in users if await authorized(current_user, 'read_profile', user)]
+    criteria = authorization_filter(current_user, 'read_profile', User)
+    if page.stream:
+        return stream_json(repository_non_members_query(repository.id, criteria), UserInfo)
+    users = await get_repository_non_members(repository.id, criteria, page=page)
+    return trusted_json(paginate(users, page, request, response), response)
 
 
-@router.get('/{repository_id}/members')
+@router.get('/{repository_id}/non-members/search', response_model=list[UserInfo])
+async def search_non_members(
+    repository: TargetRepository,
+    current_user: CurrentUser,
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(config.SEARCH_LIMIT, ge=1, le=config.MAX_SEARCH_LIMIT),
+) -> list[UserInfo] | Response:
+    """
+    Find the users who aren't members of the repository and whose name or email starts with q.
+    """
+    await check_authz(current_user, 'list_role_assignments', repository)
+    users = await search_repository_non_members(
+        repository.id, q, limit, authorization_filter(current_user, 'read_profile', User)
+    )
+    return trusted_json(users)
+
+
+@router.get('/{repository_id}/members', response_model=list[RepositoryMemberInfo])
 async def list_members(
+    request: Request,
+    response: Response,
     repository: TargetRepository,
     current_user: CurrentUser,
-) -> list[RepositoryMemberInfo]:
+    page: PageParams,
+) -> list[RepositoryMemberInfo] | Response:
     """
-    List all members of the repository.
+    List the members of the repository, a page at a time.
     """
     await check_authz(current_user, 'list_role_assignments', repository)
-    users = await get_repository_members(repository.id)
-    return [user for user in users if await authorized(current_user, 'read_profile', user)]
+    criteria = authorization_filter(current_user, 'read_profile', User)
+    if page.stream:
+        return stream_json(repository_members_query(repository.id, criteria), RepositoryMemberInfo)
+    members = await get_repository_members(repository.id, criteria, page=page)
+    return trusted_json(paginate(members, page, request, response), response)
 
 
 @router.post('/{repository_id}/members', status_code=status.HTTP_201_CREATED)
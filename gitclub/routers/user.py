@@ -1,10 +1,14 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request, Response, status
 
 from ..authentication import CurrentUser
-from ..authorization import action_to_roles, authorized, check_authz
+from ..authorization import action_to_roles, authorization_filter, check_authz
 from ..dependantions import TargetUser
-from ..models.repository import RepositoryInfo, get_allowed_repositories
+from ..models import api_token
+from ..models.api_token import ApiTokenCreated, ApiTokenInfo, ApiTokenInsert
+from ..models.repository import Repository, RepositoryInfo, get_allowed_repositories
 from ..models.user import UserInfo
+from ..pagination import PageParams, paginate
+from ..responses import trusted_json
 
 router = APIRouter(prefix='/users', tags=['users'])
 
@@ -19,11 +23,14 @@ async def get_user_info(
     return user
 
 
-@router.get('/{id}/repositories')
+@router.get('/{id}/repositories', response_model=list[RepositoryInfo])
 async def get_user_respositories(
+    request: Request,
+    response: Response,
     user: TargetUser,
     current_user: CurrentUser,
-) -> list[RepositoryInfo]:
+    page: PageParams,
+) -> list[RepositoryInfo] | Response:
     """
     Return all repositories that a user has access to via membership to an organization
     or direct access to a repository.
@@ -33,8 +40,52 @@ async def get_user_respositories(
     await check_authz(current_user, 'read_profile', user)
     repo_roles = list(action_to_roles('read', 'repository'))
     org_roles = list(action_to_roles('list_repos', 'organization'))
-    repos = await get_allowed_repositories(user.id, repo_roles=repo_roles, org_roles=org_roles)
     # but can only read repos that authenticated user (current_user) has access to
-    if current_user.id == user.id:
-        return repos
-    return [repo for repo in repos if await authorized(current_user, 'read', repo)]
+    criteria = []
+    if current_user.id != user.id:
+        criteria.append(authorization_filter(current_user, 'read', Repository))
+    repos = await get_allowed_repositories(user.id, org_roles, repo_roles, *criteria, page=page)
+    return trusted_json(paginate(repos, page, request, response), response)
+
+
+@router.get('/{id}/tokens', response_model=list[ApiTokenInfo])
+async def list_tokens(
+    user: TargetUser,
+    current_user: CurrentUser,
+) -> list[ApiTokenInfo] | Response:
+    """
+    List the API tokens of a user. The tokens themselves are not returned.
+    """
+    await check_authz(current_user, 'manage_tokens', user)
+    return trusted_json(await api_token.get_user_tokens(user.id))
+
+
+@router.post('/{id}/tokens', status_code=status.HTTP_201_CREATED)
+async def create_token(
+    data: ApiTokenInsert,
+    response: Response,
+    user: TargetUser,
+    current_user: CurrentUser,
+) -> ApiTokenCreated:
+    """
+    Create an API token to be sent in an ``Authorization: Bearer <token>`` header.
+    The token is only shown in this response.
+    """
+    await check_authz(current_user, 'manage_tokens', user)
+    token = await api_token.insert(user.id, data)
+    response.headers['Location'] = f'{router.prefix}/{user.id}/tokens/{token.id}'
+    return token
+
+
+@router.delete('/{id}/tokens/{token_id}', status_code=status.HTTP_204_NO_CONTENT)
+async def delete_token(
+    token_id: int,
+    user: TargetUser,
+    current_user: CurrentUser,
+) -> None:
+    """
+    Revoke an API token.
+    """
+    await check_authz(current_user, 'manage_tokens', user)
+    if not await api_token.delete(token_id, user.id):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail='Token not found')
@@ -1,37 +1,324 @@
+"""
+Session store.
+
+Each session is a Redis key ``{prefix}:{token}`` holding ``{lifetime}:{payload}``.
+Sessions of the same prefix (``user:{id}``, for example) are also indexed in
+a sorted set ``sessions:{prefix}`` scored by their expiration time,
+so that all the sessions of a user can be listed or revoked at once
+without scanning the keyspace.
+
+Sessions in use have their lifetime renewed (sliding expiration),
+by the lifetime they were created with.
+To avoid a Redis write per request, each session is renewed at most once per
+``config.SESSION_REFRESH_INTERVAL`` and the renewals are sent in batches.
+
+Lookups (``session_exists``, ``get_session_payload``) of concurrent requests
+are also batched through ``autopipeline``.
+
+When ``config.STATELESS_SESSIONS`` is set, sessions without payload are
+signed tokens ``{prefix}:{issued_ms}.{expires}.{nonce}.{signature}`` instead,
+and validating them doesn't touch Redis.
+Revoked tokens are kept in a denylist that every worker holds in memory.
+It is updated through cache invalidation messages and
+periodically synchronized with Redis.
+"""
+import asyncio
 import hmac
-from base64 import b64encode
+import re
+import time
+from base64 import b64encode, urlsafe_b64encode
+from contextlib import suppress
 from hashlib import sha256
 from secrets import token_urlsafe
 
+from loguru import logger
+from redis.exceptions import RedisError
+
 from . import config
+from .autopipeline import autopipeline
+from .cache import LRUCache, invalidate, on_invalidate
 from .resources import redis
 
+# names that neither a session id nor a session index can take
+DENYLIST = 'session-denylist'  # revoked tokens scored by their expiration time
+REVOKED = 'session-revoked'  # prefixes scored by the time (ms) all their tokens were revoked
+LEGACY_KEYS = {DENYLIST: 'sessions:denylist', REVOKED: 'sessions:revoked'}
+# the session ids stored in Redis, as created by create_session
+STORED_SESSION_ID = re.compile(r'user:\d+:[A-Za-z0-9_-]+')
+
+denied_tokens: dict[str, float] = {}
+revoked_prefixes: dict[str, float] = {}
+_tasks: list[asyncio.Task] = []
+
+refreshed_sessions: LRUCache[str, bool] = LRUCache(
+    'session_refresh',
+    maxsize=config.SESSION_REFRESH_CACHE_SIZE,
+    ttl=config.SESSION_REFRESH_INTERVAL,
+)
+pending_refreshes: set[str] = set()
+_flushes: set[asyncio.Task] = set()
+
+
+# deletes the sessions of an index and the index itself, so that no session created meanwhile
+# is left out, and records when the prefix was revoked
+_revoke = redis.register_script(
+    """
+    local session_ids = redis.call('ZRANGE', KEYS[1], 0, -1)
+    for i = 1, #session_ids, 1000 do
+        redis.call('DEL', unpack(session_ids, i, math.min(i + 999, #session_ids)))
+    end
+    redis.call('DEL', KEYS[1])
+    redis.call('ZADD', KEYS[2], ARGV[1], ARGV[2])
+    return session_ids
+    """
+)
+
+
+def session_index(prefix: str) -> str:
+    return f'sessions:{prefix}'
+
+
+def session_prefix(session_id: str) -> str:
+    return session_id.rpartition(':')[0]
+
+
+def _decode(value: bytes) -> tuple[int, bytes]:
+    """
+    Split the value of a session into its lifetime and payload.
+    """
+    lifetime, sep, payload = value.partition(b':')
+    if not sep or not lifetime.isdigit():  # stored before sessions kept their lifetime
+        return config.SESSION_LIFETIME, value
+    return int(lifetime), payload
+
+
+def _sign(message: str) -> str:
+    digest = hmac.new(config.SECRET_KEY, b'session:' + message.encode(), sha256).digest()
+    return urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def create_session_token(prefix: str, lifetime: int) -> str:
+    now = time.time()
+    message = f'{prefix}:{int(now * 1000):x}.{int(now) + lifetime:x}.{token_urlsafe(8)}'
+    return f'{message}.{_sign(message)}'
+
+
+def is_session_token(session_id: str) -> bool:
+    return '.' in session_id
+
+
+def _token_times(session_id: str) -> tuple[int, int] | None:
+    """
+    Return the issue time (ms) and the expiration time of a session token,
+    or None if its signature is not valid.
+    """
+    message, _, signature = session_id.rpartition('.')
+    if not hmac.compare_digest(_sign(message).encode(), signature.encode()):
+        return None
+    issued, expires, _ = message.rpartition(':')[2].split('.')
+    return int(issued, 16), int(expires, 16)
+
+
+def is_session_id(session_id: str) -> bool:
+    """
+    Whether ``session_id`` is a session of this app, rather than any other Redis key.
+    """
+    if is_session_token(session_id):
+        return _token_times(session_id) is not None
+    return STORED_SESSION_ID.fullmatch(session_id) is not None
+
+
+def is_valid_session_token(session_id: str) -> bool:
+    if not (times := _token_times(session_id)):
+        return False
+    issued, expires = times
+    return (
+        expires > time.time()
+        and session_id not in denied_tokens
+        and issued > revoked_prefixes.get(session_prefix(session_id), 0)
+    )
+
+
+def revoked_since(prefix: str, since: float) -> bool:
+    """
+    Whether the sessions of ``prefix`` were revoked after ``since`` (unix time).
+    """
+    return revoked_prefixes.get(prefix, 0) > since * 1000
+
 
 async def create_session(prefix: str, payload: str = '', lifetime: int | None = None) -> str:
     """
     Creates a random session_id and stores the related data into Redis.
     """
-    session_id: str = f'{prefix}:{token_urlsafe(config.SESSION_ID_LENGTH)}'
     lifetime = lifetime or config.SESSION_LIFETIME
-    await redis.set(session_id, payload, ex=lifetime)
+    if config.STATELESS_SESSIONS and not payload:
+        return create_session_token(prefix, lifetime)
+    session_id: str = f'{prefix}:{token_urlsafe(config.SESSION_ID_LENGTH)}'
+    index = session_index(prefix)
+    now = time.time()
+    # in a transaction, so that revoke_sessions finds the session in the index
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.set(session_id, f'{lifetime}:{payload}', ex=lifetime)
+        pipe.zadd(index, {session_id: now + lifetime})
+        pipe.zremrangebyscore(index, '-inf', now)  # forget expired sessions
+        pipe.expire(index, max(lifetime, config.SESSION_LIFETIME))
+        await pipe.execute()
+    refreshed_sessions.set(session_id, True)
     return session_id
 
 
-async def get_session_payload(session_id: str) -> str | None:
-    return await redis.get(session_id)
+async def get_session_payload(session_id: str) -> bytes | None:
+    value = await autopipeline.execute('GET', session_id)
+    return None if value is None else _decode(value)[1]
 
 
 async def delete_session(*args: str) -> None:
-    await redis.delete(*args)
+    """
+    Delete sessions. Ids that are not sessions, such as a forged cookie, are ignored.
+    """
+    args = tuple(session_id for session_id in args if is_session_id(session_id))
+    if not args:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.delete(*args)
+        for session_id in args:
+            if not is_session_token(session_id):
+                pipe.zrem(session_index(session_prefix(session_id)), session_id)
+            elif times := _token_times(session_id):
+                pipe.zadd(DENYLIST, {session_id: times[1]})
+        await pipe.execute()
+    for session_id in args:
+        await invalidate('session', session_id)
+
+
+async def list_sessions(prefix: str) -> list[str]:
+    """Returns the live sessions of ``prefix``. Session tokens are not listed."""
+    session_ids = await redis.zrangebyscore(session_index(prefix), time.time(), '+inf')
+    return [session_id.decode() for session_id in session_ids]
 
 
-async def session_keys(pattern: str) -> list[str]:
-    """Returns a list of keys matching ``pattern``"""
-    return await redis.keys(pattern)
+async def revoke_sessions(prefix: str) -> int:
+    """
+    Deletes all sessions of ``prefix``, including session tokens.
+    Returns the number of sessions deleted from Redis.
+    """
+    revoked = await _revoke(
+        keys=[session_index(prefix), REVOKED], args=[int(time.time() * 1000), prefix]
+    )
+    session_ids = [session_id.decode() for session_id in revoked]
+    for session_id in session_ids:
+        await invalidate('session', session_id)
+    await invalidate('sessions', prefix)
+    return len(session_ids)
+
+
+def touch_session(session_id: str) -> None:
+    """
+    Schedule the renewal of the session lifetime, unless it was recently renewed.
+    Renewals requested during the same event loop iteration are sent in one pipeline.
+
+    Session tokens carry their expiration time and are not renewed.
+    """
+    if is_session_token(session_id) or refreshed_sessions.get(session_id):
+        return
+    refreshed_sessions.set(session_id, True)
+    if not pending_refreshes:
+        task = asyncio.create_task(flush_refreshes())
+        _flushes.add(task)
+        task.add_done_callback(_flushes.discard)
+    pending_refreshes.add(session_id)
+
+
+async def flush_refreshes() -> None:
+    session_ids = list(pending_refreshes)
+    pending_refreshes.clear()
+    if not session_ids:
+        return
+    try:
+        values = await redis.mget(session_ids)
+        now = time.time()
+        async with redis.pipeline(transaction=False) as pipe:
+            for session_id, value in zip(session_ids, values, strict=True):
+                if value is None:  # expired or deleted meanwhile
+                    continue
+                lifetime = _decode(value)[0]
+                index = session_index(session_prefix(session_id))
+                pipe.expire(session_id, lifetime)
+                pipe.zadd(index, {session_id: now + lifetime}, xx=True)
+                pipe.expire(index, max(lifetime, config.SESSION_LIFETIME))
+            await pipe.execute()
+    except (RedisError, OSError) as error:
+        logger.warning(f'Could not renew {len(session_ids)} sessions: {error}')
 
 
 async def session_exists(session_id: str) -> bool:
-    return len(await session_keys(session_id)) > 0
+    if is_session_token(session_id):
+        return is_valid_session_token(session_id)
+    return await autopipeline.execute('EXISTS', session_id) > 0
+
+
+def _deny_token(session_id: str) -> None:
+    if is_session_token(session_id) and (times := _token_times(session_id)):
+        denied_tokens[session_id] = times[1]
+
+
+def _revoke_prefix(prefix: str) -> None:
+    revoked_prefixes[prefix] = int(time.time() * 1000)
+
+
+on_invalidate('session', _deny_token)
+on_invalidate('sessions', _revoke_prefix)
+
+
+async def sync_denylist() -> None:
+    """
+    Replace the local denylist with the one in Redis, discarding expired entries.
+    """
+    now = time.time()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.zremrangebyscore(DENYLIST, '-inf', now)
+        pipe.zremrangebyscore(REVOKED, '-inf', (now - config.SESSION_LIFETIME) * 1000)
+        pipe.zrange(DENYLIST, 0, -1, withscores=True)
+        pipe.zrange(REVOKED, 0, -1, withscores=True)
+        *_, denied, revoked = await pipe.execute()
+    denied_tokens.clear()
+    denied_tokens.update((session_id.decode(), score) for session_id, score in denied)
+    revoked_prefixes.clear()
+    revoked_prefixes.update((prefix.decode(), score) for prefix, score in revoked)
+
+
+async def _sync_periodically() -> None:
+    while True:
+        try:
+            await sync_denylist()
+        except (RedisError, OSError) as error:
+            # keep using the last known denylist
+            logger.warning(f'Could not synchronize the session denylist: {error}')
+        await asyncio.sleep(config.DENYLIST_SYNC_INTERVAL)
+
+
+async def migrate_revocations() -> None:
+    """
+    Merge the revocation sets kept under their former names, which a session id could take.
+    """
+    async with redis.pipeline(transaction=True) as pipe:
+        for key, legacy in LEGACY_KEYS.items():
+            pipe.zunionstore(key, [key, legacy], aggregate='MAX')
+            pipe.delete(legacy)
+        await pipe.execute()
+
+
+async def startup() -> None:
+    await migrate_revocations()
+    _tasks.append(asyncio.create_task(_sync_periodically()))
+
+
+async def shutdown() -> None:
+    while _tasks:
+        task = _tasks.pop()
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
 
 
 def create_csrf(session_id: str) -> str:
@@ -0,0 +1,124 @@
+"""
+Registry of the hot queries, compiled to SQL once, at import.
+
+``databases`` compiles each SQLAlchemy query again on every call.
+A ``Statement`` is compiled when it is registered and sent as is to asyncpg,
+which prepares it once per connection of the pool (its statement cache is kept
+when a connection is released) and reuses the prepared statement afterwards,
+so neither SQLAlchemy nor the server parse the query again.
+With config.DB_STATEMENT_CACHE_SIZE at 0, only the compilation is saved.
+
+Parameters are ``bindparam``s of the query, passed by name.
+Lists are passed to ``= any(:param)`` because ``in`` lists can't be compiled in advance.
+Reads are routed like the other queries, see PoolDatabase.reader.
+"""
+import time
+from typing import Any
+
+from asyncpg import Record
+from databases import Database
+from sqlalchemy.dialects.postgresql import pypostgresql
+from sqlalchemy.sql import ClauseElement
+
+from . import metrics
+from .replicas import record_write
+from .resources import db
+
+# the dialect used by databases
+_dialect = pypostgresql.dialect(paramstyle='pyformat')
+
+
+class Statement:
+    def __init__(self, name: str, query: ClauseElement) -> None:
+        self.name = name
+        self.query = query
+        compiled = query.compile(dialect=_dialect)
+        # what compiling it again on each execution would cost, once SQLAlchemy is warmed up
+        start = time.perf_counter()
+        query.compile(dialect=_dialect)
+        self.compile_seconds = time.perf_counter() - start
+        self.params = sorted(compiled.params)
+        self.sql = compiled.string % {
+            param: f'${i}' for i, param in enumerate(self.params, start=1)
+        }
+        self.executions = 0
+        # executions on connections with a statement cache, the only ones that reuse it
+        self.cached_executions = 0
+        # server time to parse and plan the statement, measured on its first execution
+        self.parse_seconds: float | None = None
+        # server processes (connections) the statement was prepared in
+        self.backends: set[int] = set()
+
+    async def _run(self, method: str, values: dict[str, Any]) -> Any:
+        args = [values[param] for param in self.params]
+        if method == 'execute':
+            record_write()
+            database: Database = db
+        else:
+            database = db.reader()
+        async with database.connection() as connection:
+            # the lock databases takes for its own queries,
+            # because the connection is shared by the tasks of a transaction
+            async with connection._query_lock:
+                raw_connection = connection.raw_connection
+                if self.parse_seconds is None:
+                    start = time.perf_counter()
+                    await raw_connection.prepare(self.sql)
+                    self.parse_seconds = time.perf_counter() - start
+                self.executions += 1
+                # without a statement cache (behind pgbouncer, say), asyncpg prepares it each time
+                if raw_connection._stmt_cache.get_max_size():
+                    self.cached_executions += 1
+                    self.backends.add(raw_connection.get_server_pid())
+                return await getattr(raw_connection, method)(self.sql, *args)
+
+    async def fetch_one(self, **values: Any) -> Record | None:
+        return await self._run('fetchrow', values)
+
+    async def fetch_all(self, **values: Any) -> list[Record]:
+        return await self._run('fetch', values)
+
+    async def fetch_val(self, **values: Any) -> Any:
+        return await self._run('fetchval', values)
+
+    async def execute(self, **values: Any) -> str:
+        return await self._run('execute', values)
+
+    def stats(self) -> dict[str, Any]:
+        # the statement is prepared once per connection, every other execution is a saving
+        reused = max(self.cached_executions - len(self.backends), 0)
+        return {
+            'executions': self.executions,
+            'compile_ms_saved': self.compile_seconds * self.executions * 1000,
+            'parse_ms_saved': (self.parse_seconds or 0) * reused * 1000,
+        }
+
+
+statements: dict[str, Statement] = {}
+
+
+def statement(name: str, query: ClauseElement) -> Statement:
+    """
+    Compile and register a query.
+    """
+    if name in statements:
+        raise ValueError(f'Statement {name} is already registered')
+    statements[name] = stmt = Statement(name, query)
+    return stmt
+
+
+def statement_stats() -> dict[str, Any]:
+    stats = {name: stmt.stats() for name, stmt in sorted(statements.items())}
+    executions = sum(s['executions'] for s in stats.values())
+    compile_ms = sum(s['compile_ms_saved'] for s in stats.values())
+    parse_ms = sum(s['parse_ms_saved'] for s in stats.values())
+    return {
+        'executions': executions,
+        'compile_ms_saved': compile_ms,
+        'parse_ms_saved': parse_ms,
+        'ms_saved_per_execution': (compile_ms + parse_ms) / executions if executions else 0,
+        'statements': stats,
+    }
+
+
+metrics.register('statements', statement_stats)
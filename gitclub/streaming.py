@@ -0,0 +1,47 @@
+"""
+Streaming of large collections as a JSON array.
+
+Rows are read through a server-side cursor and encoded as they arrive,
+so the memory used by a response doesn't grow with the number of rows.
+"""
+from collections.abc import AsyncIterator, Mapping, Sequence
+from typing import Any
+
+import orjson
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.sql import Select
+
+from . import config
+from .resources import db
+
+
+async def encode_rows(
+    rows: AsyncIterator[Mapping[str, Any]], fields: Sequence[str]
+) -> AsyncIterator[bytes]:
+    """
+    Encode the rows as a JSON array, in chunks of at least STREAM_CHUNK_SIZE bytes.
+    Only the given fields of each row are encoded.
+    """
+    chunk = bytearray(b'[')
+    separator = b''
+    async for row in rows:
+        chunk += separator
+        chunk += orjson.dumps({field: row[field] for field in fields})
+        separator = b','
+        if len(chunk) >= config.STREAM_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    chunk += b']'
+    yield bytes(chunk)
+
+
+def stream_json(query: Select, model: type[BaseModel]) -> StreamingResponse:
+    """
+    Stream the result of the query as a JSON array of ``model``.
+
+    Rows come straight from the database, so they are not validated by the model,
+    but columns that are not fields of the model (a password hash, for instance) are left out.
+    """
+    rows = encode_rows(db.iterate(query), list(model.__fields__))
+    return StreamingResponse(rows, media_type='application/json')
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Measures how many authorization decisions per second ``authorized`` makes
+once the roles are known (memoized), that is, the cost of evaluating the policy itself.
+
+Usage: PYTHONPATH=. scripts/bench_authorization.py [decisions]
+"""
+import asyncio
+import os
+import sys
+import time
+
+os.environ['ENV'] = 'testing'
+
+from loguru import logger  # noqa: E402
+
+from gitclub.authorization import authorized, role_memo  # noqa: E402
+from gitclub.models.issue import IssueInfo  # noqa: E402
+from gitclub.models.organization import OrganizationInfo  # noqa: E402
+from gitclub.models.repository import RepositoryInfo  # noqa: E402
+from gitclub.models.user import UserInfo  # noqa: E402
+
+actor = UserInfo(id=1, name='Actor', email='actor@email.com')
+resources = {
+    'user': UserInfo(id=2, name='Other', email='other@email.com'),
+    'organization': OrganizationInfo(
+        id=10, name='Organization', base_repo_role='reader', billing_address='Address'
+    ),
+    'repository': RepositoryInfo(id=100, name='Repository', organization_id=10),
+    'issue': IssueInfo(id=1000, title='Issue', repository_id=100, creator_id=2),
+}
+actions = ['read', 'read_profile', 'list_issues', 'close', 'create_role_assignments', 'foo']
+
+
+async def run_benchmark(decisions: int) -> None:
+    with role_memo() as memo:
+        # roles are already known, so that no query is made
+        memo.roles['organization', actor.id, 10] = 'member'
+        memo.roles['repository', actor.id, 100] = (None, 'member')
+        for kind, resource in resources.items():
+            start = time.perf_counter()
+            for i in range(decisions):
+                await authorized(actor, actions[i % len(actions)], resource)
+            elapsed = time.perf_counter() - start
+            logger.info(f'{kind:>12}: {decisions / elapsed / 1e6:.2f}M decisions/s')
+
+
+if __name__ == '__main__':
+    decisions = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    asyncio.run(run_benchmark(decisions))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Compares concurrent lookups of users by id, one query each,
+with the same lookups batched by ``gitclub.loader``.
+
+Usage: PYTHONPATH=. scripts/bench_loader.py [lookups] [distinct ids]
+
+The ids don't need to exist, the cost is in the round trips.
+"""
+import asyncio
+import os
+import sys
+import time
+
+os.environ['ENV'] = 'testing'
+
+from loguru import logger  # noqa: E402
+
+from gitclub.loader import loaders  # noqa: E402
+from gitclub.models import user  # noqa: E402
+from gitclub.resources import db  # noqa: E402
+from gitclub.statements import statements  # noqa: E402
+
+
+async def one_query_each(id_: int) -> None:
+    await statements['user.get'].fetch_all(ids=[id_])
+
+
+async def measure(lookups: int, distinct: int) -> None:
+    ids = [i % distinct for i in range(lookups)]
+    stmt = statements['user.get']
+
+    executions = stmt.executions
+    start = time.perf_counter()
+    await asyncio.gather(*(one_query_each(id_) for id_ in ids))
+    before = time.perf_counter() - start
+    logger.info(f'one query each: {before * 1000:7.1f} ms, {stmt.executions - executions} queries')
+
+    executions = stmt.executions
+    start = time.perf_counter()
+    await asyncio.gather(*(user.get(id_) for id_ in ids))
+    after = time.perf_counter() - start
+    logger.info(
+        f'       batched: {after * 1000:7.1f} ms, {stmt.executions - executions} queries '
+        f'({before / after:.0f}x)'
+    )
+    logger.info(loaders['user'].stats())
+
+
+async def run_benchmark(lookups: int, distinct: int) -> None:
+    await db.connect()
+    try:
+        await measure(lookups, distinct)
+    finally:
+        await db.disconnect()
+
+
+if __name__ == '__main__':
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 200  # noqa: PLR2004
+    asyncio.run(run_benchmark(lookups, distinct))
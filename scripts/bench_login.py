@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Measures the latency of cheap requests (GET /hello) while logins are in progress.
+
+Usage: PYTHONPATH=. scripts/bench_login.py [concurrent_logins] [requests]
+
+The benchmark runs twice: with argon2 in the event loop (no workers)
+and in a pool of config.HASH_WORKERS processes.
+It uses the test database and rolls back everything at the end.
+"""
+import asyncio
+import os
+import sys
+import time
+from statistics import quantiles
+
+os.environ['ENV'] = 'testing'
+
+from asgi_lifespan import LifespanManager  # noqa: E402
+from httpx import AsyncClient  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from gitclub import config  # noqa: E402
+from gitclub.hashing import hasher  # noqa: E402
+from gitclub.initial_data import new_user  # noqa: E402
+from gitclub.main import app  # noqa: E402
+from gitclub.resources import db  # noqa: E402
+
+EMAIL = 'benchmark@email.com'
+PASSWORD = 'benchmark password!!!'  # noqa: S105
+INTERVAL = 0.005
+
+
+async def login(client: AsyncClient) -> None:
+    await client.post('/login', json={'email': EMAIL, 'password': PASSWORD})
+
+
+async def measure(client: AsyncClient, logins: int, requests: int) -> tuple[float, float]:
+    async def cheap_requests() -> list[float]:
+        """
+        Send a request every INTERVAL seconds.
+        Latency is measured from when the request should have been sent,
+        so that the time spent waiting for a blocked event loop is also counted.
+        """
+        latencies = []
+        start = time.perf_counter()
+        for i in range(requests):
+            scheduled = start + i * INTERVAL
+            await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+            await client.get('/hello')
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+        return latencies
+
+    *_, latencies = await asyncio.gather(*(login(client) for _ in range(logins)), cheap_requests())
+    percentiles = quantiles(latencies, n=100)
+    return percentiles[49], percentiles[98]
+
+
+async def run_benchmark(logins: int, requests: int) -> None:
+    async with LifespanManager(app), db.transaction(force_rollback=True):
+        await new_user(name='Benchmark', email=EMAIL, password=PASSWORD)
+        async with AsyncClient(app=app, base_url='http://testserver') as client:
+            for workers in (0, config.HASH_WORKERS):
+                hasher.stop()
+                hasher.workers = workers
+                hasher.start()
+                await login(client)  # warm up the pool
+                p50, p99 = await measure(client, logins, requests)
+                logger.info(
+                    f'hash workers={workers} logins={logins}: '
+                    f'GET /hello p50={p50:.2f}ms p99={p99:.2f}ms'
+                )
+
+
+if __name__ == '__main__':
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200  # noqa: PLR2004
+    asyncio.run(run_benchmark(logins, requests))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Compares the cost per row of building models from database rows
+with validation, ``UserInfo(**row._mapping)``, and with ``models.from_rows``.
+
+Usage: PYTHONPATH=. scripts/bench_models.py [rows] [rounds]
+
+The rows are generated by the test database, no table is touched.
+"""
+import asyncio
+import os
+import sys
+import time
+from collections.abc import Callable, Sequence
+from typing import Any
+
+os.environ['ENV'] = 'testing'
+
+from databases.interfaces import Record  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from gitclub.models import from_rows  # noqa: E402
+from gitclub.models.user import UserInfo  # noqa: E402
+from gitclub.resources import db  # noqa: E402
+
+query = """
+select
+    g as id, 'User ' || g as name, 'user' || g || '@example.com' as email, '' as password_hash
+from
+    generate_series(1, :rows) g
+"""
+
+
+def validated(rows: Sequence[Record]) -> list[UserInfo]:
+    return [UserInfo(**row._mapping) for row in rows]
+
+
+def trusted(rows: Sequence[Record]) -> list[UserInfo]:
+    return from_rows(UserInfo, rows)
+
+
+def measure(build: Callable[[Sequence[Record]], Any], rows: Sequence[Record], rounds: int) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        build(rows)
+        best = min(best, time.perf_counter() - start)
+    return best / len(rows)
+
+
+async def run_benchmark(num_rows: int, rounds: int) -> None:
+    await db.connect()
+    try:
+        rows = await db.fetch_all(query, values={'rows': num_rows})
+    finally:
+        await db.disconnect()
+    if validated(rows) != trusted(rows):
+        raise RuntimeError('the models differ')
+    before = measure(validated, rows, rounds)
+    after = measure(trusted, rows, rounds)
+    logger.info(f'{num_rows} rows, best of {rounds} rounds')
+    logger.info(f'validated: {before * 1e6:6.2f} µs/row')
+    logger.info(f'  trusted: {after * 1e6:6.2f} µs/row ({before / after:.0f}x)')
+
+
+if __name__ == '__main__':
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5  # noqa: PLR2004
+    asyncio.run(run_benchmark(num_rows, rounds))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Compares the time to serialize a list of models returned by a handler
+the way FastAPI does it (validation against the response model, jsonable_encoder, orjson)
+and with ``responses.trusted_json``.
+
+Usage: PYTHONPATH=. scripts/bench_responses.py [items] [rounds]
+"""
+import asyncio
+import os
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+os.environ['ENV'] = 'testing'
+
+from fastapi.responses import ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from gitclub.models.user_organization import OrganizationMemberInfo  # noqa: E402
+from gitclub.responses import trusted_json  # noqa: E402
+
+field = create_response_field(name='Response_list_members', type_=list[OrganizationMemberInfo])
+
+
+async def fastapi_response(members: list[OrganizationMemberInfo]) -> bytes:
+    content = await serialize_response(field=field, response_content=members)
+    return ORJSONResponse(content).body
+
+
+async def trusted_response(members: list[OrganizationMemberInfo]) -> bytes:
+    return trusted_json(members).body
+
+
+async def measure(
+    serialize: Callable[[Any], Awaitable[bytes]], members: list[OrganizationMemberInfo], rounds: int
+) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await serialize(members)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def run_benchmark(items: int, rounds: int) -> None:
+    members = [
+        OrganizationMemberInfo.construct(
+            id=i, name=f'User {i}', email=f'user{i}@example.com', role='member'
+        )
+        for i in range(items)
+    ]
+    if await fastapi_response(members) != await trusted_response(members):
+        raise RuntimeError('the responses differ')
+    before = await measure(fastapi_response, members, rounds)
+    after = await measure(trusted_response, members, rounds)
+    logger.info(f'{items} members, best of {rounds} rounds')
+    logger.info(f'fastapi: {before * 1e3:8.2f} ms')
+    logger.info(f'trusted: {after * 1e3:8.2f} ms ({before / after:.0f}x)')
+
+
+if __name__ == '__main__':
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5  # noqa: PLR2004
+    asyncio.run(run_benchmark(items, rounds))
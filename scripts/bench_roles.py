@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Compares the latency of resolving the roles of a user in a repository
+with two sequential queries (repository role, then organization role on a miss)
+and with the single query used by authorization.
+
+Usage: PYTHONPATH=. scripts/bench_roles.py [concurrency] [lookups]
+
+The test database is loaded with organizations, repositories and role assignments,
+which are deleted at the end. Concurrent lookups compete for the connections of the pool,
+as requests do under load.
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from statistics import quantiles
+
+from dotenv import load_dotenv
+
+# the test database, but with a connection pool instead of a single rolled back connection
+load_dotenv()
+os.environ['DB_NAME'] = f'test_{os.environ["DB_NAME"]}'
+
+from loguru import logger  # noqa: E402
+
+from gitclub.models.organization import Organization  # noqa: E402
+from gitclub.models.repository import Repository  # noqa: E402
+from gitclub.models.user import User  # noqa: E402
+from gitclub.models.user_organization import (  # noqa: E402
+    UserOrganization,
+    get_user_role_in_organization,
+)
+from gitclub.models.user_repository import (  # noqa: E402
+    UserRepository,
+    get_user_role_in_repository,
+    get_user_roles_in_repository,
+)
+from gitclub.resources import db  # noqa: E402
+
+REPOSITORIES_PER_ORGANIZATION = 20
+FIRST_ID = 1_900_000_000  # far from the ids of the test dataset
+
+USERS = range(FIRST_ID, FIRST_ID + 1_000)
+ORGANIZATIONS = range(FIRST_ID, FIRST_ID + 1_000)
+REPOSITORIES = range(FIRST_ID, FIRST_ID + len(ORGANIZATIONS) * REPOSITORIES_PER_ORGANIZATION)
+
+Lookup = Callable[[int, int], Awaitable[str | None]]
+
+
+def organization_of(repository_id: int) -> int:
+    return FIRST_ID + (repository_id - FIRST_ID) // REPOSITORIES_PER_ORGANIZATION
+
+
+async def sequential(user_id: int, repository_id: int) -> str | None:
+    """How authorization used to resolve the role"""
+    return await get_user_role_in_repository(
+        user_id, repository_id
+    ) or await get_user_role_in_organization(user_id, organization_of(repository_id))
+
+
+async def combined(user_id: int, repository_id: int) -> str | None:
+    repository_role, organization_role = await get_user_roles_in_repository(user_id, repository_id)
+    return repository_role or organization_role
+
+
+async def populate() -> None:
+    async with db.connection() as connection:
+        conn = connection.raw_connection
+        await conn.copy_records_to_table(
+            'user',
+            records=[(i, f'user {i}', f'{i}@bench.com', '') for i in USERS],
+            columns=['id', 'name', 'email', 'password_hash'],
+        )
+        await conn.copy_records_to_table(
+            'organization',
+            records=[(i, f'org {i}') for i in ORGANIZATIONS],
+            columns=['id', 'name'],
+        )
+        await conn.copy_records_to_table(
+            'repository',
+            records=[(i, f'repo {i}', organization_of(i)) for i in REPOSITORIES],
+            columns=['id', 'name', 'organization_id'],
+        )
+        # every user belongs to 10 organizations and has a direct role in 10 repositories
+        await conn.copy_records_to_table(
+            'user_organization',
+            records={(u, o, 'member') for u in USERS for o in random.sample(ORGANIZATIONS, 10)},
+            columns=['user_id', 'organization_id', 'role'],
+        )
+        await conn.copy_records_to_table(
+            'user_repository',
+            records={(u, r, 'reader') for u in USERS for r in random.sample(REPOSITORIES, 10)},
+            columns=['user_id', 'repository_id', 'role'],
+        )
+        await conn.execute('analyze')
+
+
+async def clean_up() -> None:
+    await db.execute(UserRepository.delete().where(UserRepository.c.user_id >= FIRST_ID))
+    await db.execute(UserOrganization.delete().where(UserOrganization.c.user_id >= FIRST_ID))
+    await db.execute(Repository.delete().where(Repository.c.id >= FIRST_ID))
+    await db.execute(Organization.delete().where(Organization.c.id >= FIRST_ID))
+    await db.execute(User.delete().where(User.c.id >= FIRST_ID))
+
+
+async def measure(lookup: Lookup, concurrency: int, lookups: int) -> tuple[float, float]:
+    latencies: list[float] = []
+
+    async def client() -> None:
+        for _ in range(lookups // concurrency):
+            user_id = random.choice(USERS)  # noqa: S311
+            repository_id = random.choice(REPOSITORIES)  # noqa: S311
+            start = time.perf_counter()
+            await lookup(user_id, repository_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    percentiles = quantiles(latencies, n=100)
+    return percentiles[49], percentiles[98]
+
+
+async def run_benchmark(concurrency: int, lookups: int) -> None:
+    await db.connect()
+    try:
+        await clean_up()
+        await populate()
+        for lookup in (sequential, combined, sequential, combined):
+            p50, p99 = await measure(lookup, concurrency, lookups)
+            logger.info(
+                f'{lookup.__name__:>10}: concurrency={concurrency} '
+                f'p50={p50:.2f}ms p99={p99:.2f}ms'
+            )
+    finally:
+        await clean_up()
+        await db.disconnect()
+
+
+if __name__ == '__main__':
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000  # noqa: PLR2004
+    asyncio.run(run_benchmark(concurrency, lookups))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Measures session_exists latency as the number of live sessions grows.
+
+Usage: PYTHONPATH=. scripts/bench_sessions.py [sizes...]
+
+Default sizes: 1000 10000 100000 1000000 10000000
+
+Runs against Redis database 15 (override with REDIS_URL), which is flushed at the end.
+"""
+import asyncio
+import os
+import sys
+import time
+from secrets import token_urlsafe
+from statistics import quantiles
+
+os.environ.setdefault('REDIS_URL', 'redis://localhost:6379/15')
+
+from loguru import logger  # noqa: E402
+
+from gitclub import config  # noqa: E402
+from gitclub.resources import redis  # noqa: E402
+from gitclub.sessions import create_session, session_exists, session_index  # noqa: E402
+
+BATCH = 10_000
+SAMPLES = 2_000
+USERS = 100_000
+
+
+async def populate(start: int, stop: int) -> None:
+    """Insert sessions the same way create_session does, but in large pipelines"""
+    now = time.time()
+    for batch_start in range(start, stop, BATCH):
+        async with redis.pipeline(transaction=False) as pipe:
+            for i in range(batch_start, min(batch_start + BATCH, stop)):
+                prefix = f'user:{i % USERS}'
+                session_id = f'{prefix}:{token_urlsafe(config.SESSION_ID_LENGTH)}'
+                pipe.set(session_id, '', ex=config.SESSION_LIFETIME)
+                pipe.zadd(session_index(prefix), {session_id: now + config.SESSION_LIFETIME})
+            await pipe.execute()
+
+
+async def measure(session_ids: list[str]) -> tuple[float, float]:
+    latencies = []
+    for session_id in session_ids:
+        start = time.perf_counter()
+        if not await session_exists(session_id):
+            raise RuntimeError(f'session {session_id} not found')
+        latencies.append((time.perf_counter() - start) * 1000)
+    percentiles = quantiles(latencies, n=100)
+    return percentiles[49], percentiles[98]
+
+
+async def run_benchmark(sizes: list[int]) -> None:
+    await redis.flushdb()
+    try:
+        probes = [await create_session(f'user:{i}') for i in range(SAMPLES)]
+        populated = SAMPLES
+        for size in sorted(sizes):
+            await populate(populated, size)
+            populated = max(populated, size)
+            p50, p99 = await measure(probes)
+            logger.info(f'{populated:>10,} sessions: p50={p50:.3f}ms p99={p99:.3f}ms')
+    finally:
+        await redis.flushdb()
+        await redis.close()
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+    asyncio.run(run_benchmark(sizes))
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+"""
+Calibrate the argon2 costs to config.HASH_TARGET_MS again and share them through Redis.
+
+Usage: PYTHONPATH=. scripts/calibrate_hashing.py
+
+Run it on the hardware of the workers, then restart them.
+"""
+import asyncio
+
+from loguru import logger
+
+from gitclub import config
+from gitclub.hashing import recalibrate
+from gitclub.resources import redis
+
+
+async def main() -> None:
+    if not config.HASH_TARGET_MS:
+        raise SystemExit('HASH_TARGET_MS is not set')
+    try:
+        settings = await recalibrate()
+    finally:
+        await redis.close()
+    logger.info(f'argon2 costs calibrated to {config.HASH_TARGET_MS}ms: {settings}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
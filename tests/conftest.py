@@ -10,6 +10,7 @@ from pytest import fixture
 
 os.environ['ENV'] = 'testing'
 
+from gitclub.cache import caches  # noqa: E402
 from gitclub.main import app as _app  # noqa: E402
 from gitclub.resources import db  # noqa: E402
 
@@ -57,6 +58,9 @@ async def session_app(init_test_db: None) -> AsyncIterable[FastAPI]:
 async def app(session_app: FastAPI) -> AsyncIterable[FastAPI]:
     async with db.transaction(force_rollback=True):
         yield session_app
+    # forget what was cached from the rolled back transaction
+    for cache in caches.values():
+        cache.clear()
 
 
 @fixture
@@ -0,0 +1,250 @@
+"""
+Query plan regression tests.
+
+Every query of gitclub.models is run against tables seeded with enough rows
+for the planner to prefer indexes, and its plan must not scan a large table sequentially.
+"""
+import inspect
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import ExitStack, contextmanager
+from typing import Any
+from unittest.mock import patch
+
+import orjson
+import pytest
+from asyncpg import Connection
+from fastapi import FastAPI
+
+from gitclub import models
+from gitclub.authorization import authorization_filter
+from gitclub.hashing import hasher
+from gitclub.models import (
+    api_token,
+    issue,
+    organization,
+    repository,
+    user,
+    user_organization,
+    user_repository,
+)
+from gitclub.pagination import Page
+from gitclub.resources import db
+
+USERS = 5_000
+ORGANIZATIONS = 1_000
+REPOSITORIES_PER_ORGANIZATION = 10
+ISSUES_PER_REPOSITORY = 2
+PASSWORD = 'a very long password'  # noqa: S105
+
+# negative ids don't collide with the ones of the test dataset
+U = -1  # member of organization O and reader of repository R
+U2 = -USERS - 1  # no roles, issues or tokens
+O = -1  # noqa: E741
+R = -1
+I = -1  # noqa: E741
+
+# queries that read the whole table on purpose
+FULL_SCANS = {
+    ('user.get_all', 'user'),
+    # every user that is not a member
+    ('user_organization.get_organization_non_members', 'user'),
+    ('user_repository.get_repository_non_members', 'user'),
+}
+
+
+def seeded_rows() -> dict[str, list[tuple]]:
+    users = range(-USERS, 0)
+    organizations = range(-ORGANIZATIONS, 0)
+    repositories = range(-ORGANIZATIONS * REPOSITORIES_PER_ORGANIZATION, 0)
+    issues = range(-len(repositories) * ISSUES_PER_REPOSITORY, 0)
+    return {
+        'user': [(i, f'user {i}', f'user{-i}@seed.com', '') for i in [*users, U2]],
+        'organization': [(i, f'organization {i}', 'reader', '') for i in organizations],
+        'repository': [
+            (i, f'repository {i}', i // REPOSITORIES_PER_ORGANIZATION) for i in repositories
+        ],
+        'issue': [
+            (i, f'issue {i}', False, i // ISSUES_PER_REPOSITORY, -1 - i % USERS) for i in issues
+        ],
+        'user_organization': [(i, i // 10, 'member') for i in users],
+        'user_repository': [(i, i, 'reader') for i in users],
+        'api_token': [(i, i, f'token {i}', f'{-i:064}') for i in users],
+    }
+
+
+async def seed() -> None:
+    async with db.connection() as connection:
+        conn = connection.raw_connection
+        rows = seeded_rows()
+        for table, records in rows.items():
+            await conn.copy_records_to_table(table, records=records)
+        password_hash = await hasher.hash(PASSWORD)
+        await conn.execute('update "user" set password_hash = $1 where id = $2', password_hash, U)
+        await conn.execute('analyze ' + ', '.join(f'"{table}"' for table in rows))
+
+
+@contextmanager
+def captured_queries() -> Iterator[list[tuple[str, tuple]]]:
+    """
+    Record the statements sent to Postgres, with their arguments.
+    """
+    queries: list[tuple[str, tuple]] = []
+
+    def capture(method: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        async def wrapper(self: Connection, query: str, *args: Any, **kwargs: Any) -> Any:
+            queries.append((query, args))
+            return await method(self, query, *args, **kwargs)
+
+        return wrapper
+
+    with ExitStack() as stack:
+        for name in ('execute', 'fetch', 'fetchrow', 'fetchval'):
+            method = getattr(Connection, name)
+            stack.enter_context(patch.object(Connection, name, capture(method)))
+        yield queries
+
+
+def seq_scans(plan: dict[str, Any]) -> Iterator[str]:
+    if plan['Node Type'] == 'Seq Scan':
+        yield plan['Relation Name']
+    for subplan in plan.get('Plans', ()):
+        yield from seq_scans(subplan)
+
+
+def model_calls() -> dict[str, Callable[[], Awaitable[Any]]]:
+    """
+    A call of each function of gitclub.models. Reads come before writes.
+    """
+    actor = user.UserInfo(id=U, name='user', email='user1@seed.com')
+    page = Page(10, after=-1_000_000)
+    return {
+        'api_token.get_user_by_token': lambda: api_token.get_user_by_token('gc_token'),
+        'api_token.get_user_tokens': lambda: api_token.get_user_tokens(U),
+        'issue.get': lambda: issue.get(I, R, O),
+        'issue.get_repository_issues': lambda: issue.get_repository_issues(
+            R, authorization_filter(actor, 'read', issue.Issue), page=page
+        ),
+        'organization.get': lambda: organization.get(O),
+        'repository.get': lambda: repository.get(R, O),
+        'repository.get_allowed_repositories': lambda: repository.get_allowed_repositories(
+            U,
+            ['member', 'owner'],
+            ['reader', 'maintainer', 'admin'],
+            authorization_filter(actor, 'read', repository.Repository),
+            page=page,
+        ),
+        'repository.get_organization_repositories': lambda: (
+            repository.get_organization_repositories(
+                O, authorization_filter(actor, 'read', repository.Repository), page=page
+            )
+        ),
+        'user.get_all': lambda: user.get_all(page),
+        'user.get_user_by_email': lambda: user.get_user_by_email('user1@seed.com'),
+        'user.get_user_by_login': lambda: user.get_user_by_login('user1@seed.com', PASSWORD),
+        'user.get': lambda: user.get(U),
+        'user_organization.get_user_role_in_organization': lambda: (
+            user_organization.get_user_role_in_organization(U, O)
+        ),
+        'user_organization.get_user_roles_in_organizations': lambda: (
+            user_organization.get_user_roles_in_organizations(U, [O, O - 1])
+        ),
+        'user_organization.get_user_organizations': lambda: (
+            user_organization.get_user_organizations(U, page)
+        ),
+        'user_organization.get_organization_members': lambda: (
+            user_organization.get_organization_members(O, page=page)
+        ),
+        'user_organization.get_organization_non_members': lambda: (
+            user_organization.get_organization_non_members(O, page=page)
+        ),
+        'user_organization.search_organization_non_members': lambda: (
+            user_organization.search_organization_non_members(O, 'user12', 10)
+        ),
+        'user_repository.get_user_role_in_repository': lambda: (
+            user_repository.get_user_role_in_repository(U, R)
+        ),
+        'user_repository.get_user_roles_in_repositories': lambda: (
+            user_repository.get_user_roles_in_repositories(U, [R, R - 1])
+        ),
+        'user_repository.get_user_roles_in_repository': lambda: (
+            user_repository.get_user_roles_in_repository(U, R)
+        ),
+        'user_repository.get_user_repositories': lambda: user_repository.get_user_repositories(U),
+        'user_repository.get_repository_members': lambda: (
+            user_repository.get_repository_members(R, page=page)
+        ),
+        'user_repository.get_repository_non_members': lambda: (
+            user_repository.get_repository_non_members(R, page=page)
+        ),
+        'user_repository.search_repository_non_members': lambda: (
+            user_repository.search_repository_non_members(R, 'user12', 10)
+        ),
+        # writes
+        'api_token.insert': lambda: api_token.insert(U, api_token.ApiTokenInsert(name='new')),
+        'api_token.delete': lambda: api_token.delete(U, U),
+        'issue.insert': lambda: issue.insert(
+            issue.IssueInsert(title='new', repository_id=R, creator_id=U)
+        ),
+        'issue.update': lambda: issue.update(I, issue.IssuePatch(closed=True)),
+        'organization.insert': lambda: organization.insert(
+            organization.OrganizationInsert(name='new', base_repo_role='reader', billing_address='')
+        ),
+        'repository.insert': lambda: repository.insert(
+            repository.RepositoryInsert2(name='new', organization_id=O)
+        ),
+        'user.insert': lambda: user.insert(
+            user.UserInsert(name='new', email='new@seed.com', password=PASSWORD)
+        ),
+        'user.update': lambda: user.update(U, user.UserPatch(name='updated')),
+        'user_organization.insert': lambda: user_organization.insert(
+            user_organization.UserOrganizationInfo(user_id=U2, organization_id=O, role='member')
+        ),
+        'user_organization.update_user_organization': lambda: (
+            user_organization.update_user_organization(U2, O, 'owner')
+        ),
+        'user_organization.delete_user_organization': lambda: (
+            user_organization.delete_user_organization(U2, O)
+        ),
+        'user_repository.insert': lambda: user_repository.insert(
+            user_repository.UserRepositoryInfo(user_id=U2, repository_id=R, role='reader')
+        ),
+        'user_repository.update_user_repository': lambda: (
+            user_repository.update_user_repository(U2, R, 'admin')
+        ),
+        'user_repository.delete_user_repository': lambda: (
+            user_repository.delete_user_repository(U2, R)
+        ),
+        'user.delete': lambda: user.delete(U2),
+    }
+
+
+def test_all_queries_are_covered() -> None:
+    functions = set()
+    for name in models.__all__:
+        module = getattr(models, name)
+        for func_name, func in inspect.getmembers(module, inspect.iscoroutinefunction):
+            if func.__module__ == module.__name__ and not func_name.startswith('_'):
+                functions.add(f'{name}.{func_name}')
+    assert functions == set(model_calls())
+
+
+@pytest.mark.async_timeout(60)
+async def test_query_plans(app: FastAPI) -> None:  # noqa: ARG001
+    await seed()
+    failures: list[str] = []
+    for name, call in model_calls().items():
+        with captured_queries() as queries:
+            await call()
+        assert queries, f'{name} made no query'
+        for query, args in queries:
+            async with db.connection() as connection:
+                explain = await connection.raw_connection.fetchval(
+                    f'explain (format json) {query}', *args
+                )
+            plan = orjson.loads(explain)[0]['Plan']
+            failures.extend(
+                f'{name}: sequential scan on {table}\n{query}'
+                for table in seq_scans(plan)
+                if (name, table) not in FULL_SCANS
+            )
+    assert not failures, '\n\n'.join(failures)
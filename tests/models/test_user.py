@@ -1,7 +1,13 @@
+from unittest.mock import patch
+
 from fastapi import FastAPI
+from passlib.hash import argon2
 from pytest import fixture
+from sqlalchemy import select
 
-from gitclub.models import user
+from gitclub.hashing import hasher
+from gitclub.models import from_row, user
+from gitclub.resources import db
 
 Users = list[user.UserInfo]
 
@@ -45,3 +51,55 @@ async def test_get_user_by_login(users: Users) -> None:
     # incorrect email + password
     user_info = await user.get_user_by_login(email, 'abcdefgh1234567890')
     assert user_info is None
+
+
+async def test_get_user_by_login_rehash(app: FastAPI, users: Users) -> None:
+    """
+    Hashes with outdated argon2 costs are replaced on login
+    """
+    email = password = users[0].email
+    query = select(user.User.c.password_hash).where(user.User.c.id == users[0].id)
+    defaults = {'time_cost': argon2.default_rounds, 'memory_cost': argon2.memory_cost}
+    assert 'm=1024,t=1,' not in await db.fetch_val(query)
+    hasher.stop()
+    try:
+        hasher.start({'time_cost': 1, 'memory_cost': 1024})
+        assert await user.get_user_by_login(email, password) == users[0]
+        assert 'm=1024,t=1,' in await db.fetch_val(query)
+        assert await user.get_user_by_login(email, password) == users[0]
+    finally:
+        hasher.stop()
+        hasher.start(defaults)
+
+
+async def test_from_row(users: Users) -> None:
+    row = await db.fetch_one(user.User.select().where(user.User.c.id == users[0].id))
+    assert row
+    user_info = from_row(user.UserInfo, row)
+    assert user_info == user.UserInfo(**row._mapping)
+    assert user_info.__fields_set__ == {'id', 'name', 'email'}
+    # columns that are not fields are left out
+    assert 'password_hash' not in user_info.dict()
+
+
+async def test_eviction_after_commit(session_app: FastAPI) -> None:  # noqa: ARG001
+    temp = user.UserInsert(name='Temp', email='temp@example.com', password='temp@example.com')
+    with (
+        patch('gitclub.models.user.invalidate') as invalidate,
+        patch('gitclub.models.user.revoke_sessions') as revoke_sessions,
+    ):
+        # a transaction that rolls back evicts nothing
+        async with db.transaction(force_rollback=True):
+            user_id = await user.insert(temp)
+            await user.update(user_id, user.UserPatch(name='Renamed'))
+            await user.delete(user_id)
+        invalidate.assert_not_called()
+        revoke_sessions.assert_not_called()
+
+        async with db.transaction():
+            user_id = await user.insert(temp)
+            await user.update(user_id, user.UserPatch(name='Renamed'))
+            await user.delete(user_id)
+            invalidate.assert_not_called()
+        assert invalidate.await_count == 2
+        revoke_sessions.assert_awaited_once_with(f'user:{user_id}')
@@ -3,7 +3,10 @@ from unittest.mock import AsyncMock, patch
 from httpx import AsyncClient
 from pytest import mark
 
+from gitclub.hashing import HashingBusyError
 from gitclub.models import user
+from gitclub.resources import redis
+from gitclub.sessions import DENYLIST
 
 TestData = dict[str, dict[str, int]]
 
@@ -40,6 +43,14 @@ async def test_successful_login_with_session_id(
     delete_session.assert_awaited_once_with(session_id)
 
 
+@patch('gitclub.routers.login.get_user_by_login', side_effect=HashingBusyError)
+async def test_login_hashing_busy(get_user_by_login: AsyncMock, client: AsyncClient) -> None:
+    resp = await client.post('/login', json={'email': 'john@email.com', 'password': '12345'})
+    assert resp.status_code == 503
+    assert resp.headers['retry-after'] == '1'
+    assert 'session_id' not in resp.cookies
+
+
 async def test_unsuccessful_login(client: AsyncClient) -> None:
     email = 'sicrano@email.com'
     password = '12345'
@@ -64,3 +75,11 @@ async def test_logout(
     assert 'session_id=""' in cookies_headers
     assert 'Max-Age=0' in cookies_headers
     assert delete_session.called is called
+
+
+async def test_logout_forged_session(client: AsyncClient) -> None:
+    await redis.zadd(DENYLIST, {'user:1:forged.token': 2**40})
+    resp = await client.post('/logout', cookies={'session_id': DENYLIST})
+    assert resp.status_code == 204
+    assert await redis.exists(DENYLIST)
+    await redis.zrem(DENYLIST, 'user:1:forged.token')
@@ -0,0 +1,29 @@
+from unittest.mock import patch
+
+from httpx import AsyncClient
+
+from gitclub import config
+
+
+async def test_metrics(client: AsyncClient) -> None:
+    with patch.object(config, 'METRICS_TOKEN', 'secret'):
+        resp = await client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        assert resp.status_code == 200
+        assert set(resp.json()['caches']['user']) == {
+            'size',
+            'maxsize',
+            'hits',
+            'misses',
+            'evictions',
+        }
+
+        resp = await client.get('/metrics')
+        assert resp.status_code == 401
+        resp = await client.get('/metrics', headers={'Authorization': 'Bearer wrong'})
+        assert resp.status_code == 401
+
+
+async def test_metrics_disabled(client: AsyncClient) -> None:
+    with patch.object(config, 'METRICS_TOKEN', ''):
+        resp = await client.get('/metrics', headers={'Authorization': 'Bearer '})
+        assert resp.status_code == 404
@@ -126,6 +126,78 @@ async def test_list_non_members(test_dataset: TestData, client: AsyncClient) ->
     assert resp.status_code == status.HTTP_403_FORBIDDEN
 
 
+async def test_search_non_members(test_dataset: TestData, client: AsyncClient) -> None:
+    john = test_dataset['users']['john']
+    fulano = test_dataset['users']['fulano']
+    beatles = test_dataset['organizations']['beatles']
+    url = f'/organizations/{beatles}/non-members/search'
+
+    async def search(q: str, **params: int) -> list[str]:
+        resp = await client.get(url, params={'q': q, **params})
+        assert resp.status_code == status.HTTP_200_OK
+        return [u['name'] for u in resp.json()]
+
+    await logged_session(client, john)
+    assert await search('FUL') == ['fulano']
+    assert await search('sully+test@') == ['sully']  # by email
+    assert await search('john') == []  # member
+    assert await search('%') == await search('_') == []  # not wildcards
+    assert await search('m', limit=1) == ['mike']
+
+    resp = await client.get(url, params={'q': ''})
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    # fulano shouldn't be able to search beatles non_members
+    await logged_session(client, fulano)
+    resp = await client.get(url, params={'q': 'f'})
+    assert resp.status_code == status.HTTP_403_FORBIDDEN
+
+
+async def test_paginate_non_members(test_dataset: TestData, client: AsyncClient) -> None:
+    john = test_dataset['users']['john']
+    beatles = test_dataset['organizations']['beatles']
+    url = f'/organizations/{beatles}/non-members'
+    await logged_session(client, john)
+
+    # follow the next links, 2 users at a time
+    ids: list[int] = []
+    next_url: str | None = f'{url}?limit=2'
+    while next_url:
+        resp = await client.get(next_url)
+        assert resp.status_code == status.HTTP_200_OK
+        assert len(resp.json()) <= 2
+        ids.extend(u['id'] for u in resp.json())
+        next_url = resp.links.get('next', {}).get('url')
+    assert len(ids) == 5
+    assert ids == sorted(ids)
+
+    resp = await client.get(url, params={'limit': 5})
+    assert [u['id'] for u in resp.json()] == ids
+    assert 'Link' not in resp.headers
+
+    resp = await client.get(url, params={'after': 'not a cursor'})
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    resp = await client.get(url, params={'limit': 0})
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_stream_members(test_dataset: TestData, client: AsyncClient) -> None:
+    john = test_dataset['users']['john']
+    beatles = test_dataset['organizations']['beatles']
+    await logged_session(client, john)
+
+    for endpoint in ('members', 'non-members'):
+        url = f'/organizations/{beatles}/{endpoint}'
+        listed = (await client.get(url)).json()
+        resp = await client.get(url, params={'stream': True, 'limit': 1})
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.headers['content-type'] == 'application/json'
+        streamed = resp.json()
+        assert sorted(streamed, key=lambda u: u['id']) == listed
+        # only the fields of the response model
+        assert set(streamed[0]) == set(listed[0])
+
+
 async def test_add_member(test_dataset: TestData, client: AsyncClient) -> None:
     john = test_dataset['users']['john']
     paul = test_dataset['users']['paul']
@@ -27,6 +27,8 @@ async def test_list_repositories(test_dataset: TestData, client: AsyncClient) ->
     repositories = resp.json()
     assert len(repositories) == 2
     assert {abbey_road, the_white_album} == {r['id'] for r in repositories}
+    # only the organization role, repositories are filtered in SQL
+    assert resp.headers['x-role-queries'] == '1'
 
     # fulano is not a member of beatles and cannot list repositories
     await logged_session(client, fulano)
@@ -76,6 +78,8 @@ async def test_show_repository(test_dataset: TestData, client: AsyncClient) -> N
     resp = await client.get(url.format(beatles, abbey_road))
     assert resp.status_code == 200
     assert RepositoryInfo(**resp.json()).id == abbey_road
+    # john's role is checked both in get_repository and in show, but only queried once
+    assert resp.headers['x-role-queries'] == '1'
 
     # john cannot access a repository that does not belong to beatles
     await logged_session(client, john)
@@ -1,5 +1,6 @@
 from httpx import AsyncClient
 
+from gitclub.models.api_token import ApiTokenCreated
 from gitclub.models.user import UserInfo
 
 from ..utils import logged_session
@@ -60,9 +61,70 @@ async def test_get_user_repositories(test_dataset: TestData, client: AsyncClient
     # john can only see part of mike's repositories that he has access to
     assert [r['id'] for r in repositories] == [abbey_road]
 
+    # pages only hold repositories john has access to
+    resp = await client.get(url.format(mike), params={'limit': 1})
+    assert [r['id'] for r in resp.json()] == [abbey_road]
+    assert 'next' not in resp.links
+
     # mike gets his own repositories
     await logged_session(client, mike)
     resp = await client.get(url.format(mike))
     assert resp.status_code == 200
     repositories = resp.json()
     assert {r['id'] for r in repositories} == {paperwork, abbey_road}
+
+
+async def test_api_tokens(test_dataset: TestData, client: AsyncClient) -> None:
+    john = test_dataset['users']['john']
+    paul = test_dataset['users']['paul']
+    url = f'/users/{john}/tokens'
+
+    # unauthenticated user
+    resp = await client.post(url, json={'name': 'ci'})
+    assert resp.status_code == 401
+
+    # paul cannot create tokens for john
+    await logged_session(client, paul)
+    resp = await client.post(url, json={'name': 'ci'})
+    assert resp.status_code == 403
+
+    # john creates a token
+    await logged_session(client, john)
+    resp = await client.post(url, json={'name': 'ci'})
+    assert resp.status_code == 201
+    token = ApiTokenCreated(**resp.json())
+    assert resp.headers['Location'] == f'{url}/{token.id}'
+
+    resp = await client.get(url)
+    assert resp.status_code == 200
+    assert resp.json() == [{'id': token.id, 'user_id': john, 'name': 'ci'}]
+
+    # requests authenticated by the token don't need cookies or csrf tokens
+    await logged_session(client)
+    headers = {'Authorization': f'Bearer {token.token}'}
+    resp = await client.get(f'/users/{paul}', headers=headers)
+    assert resp.status_code == 200
+    resp = await client.get(f'/users/{paul}', headers=headers)  # cached
+    assert resp.status_code == 200
+
+    for authorization in ('Bearer invalid', f'Basic {token.token}', 'Bearer'):
+        resp = await client.get(f'/users/{paul}', headers={'Authorization': authorization})
+        assert resp.status_code == 401
+
+    # a session is still accepted along with credentials of another scheme
+    await logged_session(client, john)
+    resp = await client.get(f'/users/{paul}', headers={'Authorization': 'Basic dXNlcjpwYXNz'})
+    assert resp.status_code == 200
+    resp = await client.get(f'/users/{paul}', headers={'Authorization': 'Bearer invalid'})
+    assert resp.status_code == 401
+    await logged_session(client)
+
+    # revoked tokens are no longer accepted
+    resp = await client.delete(f'{url}/{token.id}', headers=headers)
+    assert resp.status_code == 204
+    resp = await client.get(f'/users/{paul}', headers=headers)
+    assert resp.status_code == 401
+
+    await logged_session(client, john)
+    resp = await client.delete(f'{url}/{token.id}')
+    assert resp.status_code == 404
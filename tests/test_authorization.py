@@ -1,17 +1,29 @@
 import pytest
 from fastapi import HTTPException
+from sqlalchemy import select
 
 from gitclub.authorization import (
+    action_bits,
     action_to_roles,
+    authorization_filter,
     authorized,
+    authorized_many,
     check_resource_role,
     issue_actions,
+    issue_masks,
     org_actions,
+    org_masks,
     repo_actions,
+    repo_masks,
     resource_roles,
+    role_memo,
     user_actions,
+    user_masks,
 )
 from gitclub.models import issue, organization, repository, user
+from gitclub.models.user_organization import OrganizationMemberInfo
+from gitclub.resources import db
+from gitclub.role_cache import role_cache
 
 TestData = dict[str, dict[str, int]]
 
@@ -121,6 +133,81 @@ async def test_authorization(test_dataset: TestData) -> None:  # noqa: PLR0915
         await authorized(beatles, 'foo', beatles)
 
 
+async def test_role_memo(test_dataset: TestData) -> None:
+    ringo = await user.get(test_dataset['users']['ringo'])
+    abbey_road = await repository.get(test_dataset['repositories']['abbey_road'])
+    assert ringo and abbey_road
+    role_cache.local.clear()
+
+    with role_memo() as memo:
+        # ringo has no role in abbey_road, but is a member of the beatles
+        # both roles are resolved in a single query
+        assert await authorized(ringo, 'read', abbey_road)
+        assert memo.queries == 1
+        assert await authorized(ringo, 'list_issues', abbey_road)
+        assert not await authorized(ringo, 'create_role_assignments', abbey_road)
+        assert memo.queries == 1
+
+
+async def test_authorized_many(test_dataset: TestData) -> None:
+    users = [await user.get(id_) for id_ in test_dataset['users'].values()]
+    resources = (
+        users
+        + [await organization.get(id_) for id_ in test_dataset['organizations'].values()]
+        + [await repository.get(id_) for id_ in test_dataset['repositories'].values()]
+        + [await issue.get(id_) for id_ in test_dataset['issues'].values()]
+    )
+    actions = ['read', 'read_profile', 'list_issues', 'close', 'create_role_assignments']
+    for actor in users:
+        assert actor
+        for action in actions:
+            expected = [await authorized(actor, action, r) for r in resources]  # type: ignore
+            with role_memo() as memo:
+                assert await authorized_many(actor, action, resources) == expected  # type: ignore
+            assert memo.queries <= 2
+
+
+async def test_authorization_filter(test_dataset: TestData) -> None:
+    users = [await user.get(id_) for id_ in test_dataset['users'].values()]
+    tables = {
+        user.User: user.UserInfo,
+        organization.Organization: organization.OrganizationInfo,
+        repository.Repository: repository.RepositoryInfo,
+        issue.Issue: issue.IssueInfo,
+    }
+    actions = ['read', 'read_profile', 'update_profile', 'list_issues', 'close', 'reopen', 'foo']
+    for table, model in tables.items():
+        rows = {row['id']: model(**row._mapping) for row in await db.fetch_all(table.select())}
+        for actor in users:
+            assert actor
+            for action in actions:
+                expected = {id_ for id_, r in rows.items() if await authorized(actor, action, r)}
+                query = select(table.c.id).where(authorization_filter(actor, action, table))
+                assert {row['id'] for row in await db.fetch_all(query)} == expected
+
+    join = issue.Issue.join(repository.Repository)
+    with pytest.raises(NotImplementedError):
+        authorization_filter(users[0], 'read', join)  # type: ignore
+
+
+async def test_compiled_policy(test_dataset: TestData) -> None:
+    for actions, masks in (
+        (user_actions, user_masks),
+        (org_actions, org_masks),
+        (repo_actions, repo_masks),
+        (issue_actions, issue_masks),
+    ):
+        for role, role_actions in actions.items():
+            assert {a for a, bit in action_bits.items() if masks[role] & bit} == role_actions
+
+    # subclasses follow the policy of their base class
+    john = await user.get(test_dataset['users']['john'])
+    assert john
+    member = OrganizationMemberInfo(**john.dict(), role='owner')
+    assert await authorized(john, 'update_profile', member)
+    assert not await authorized(john, 'foo', member)
+
+
 def test_resource_roles() -> None:
     assert resource_roles('user') == {'reader', 'owner'}
     assert resource_roles('organization') == {'member', 'owner'}
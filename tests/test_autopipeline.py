@@ -0,0 +1,42 @@
+import asyncio
+
+from fastapi import FastAPI
+from pytest import raises
+from redis.exceptions import ResponseError
+
+from gitclub.autopipeline import autopipeline
+from gitclub.resources import redis
+from gitclub.sessions import create_session, delete_session, get_session_payload, session_exists
+
+
+async def test_autopipeline(session_app: FastAPI) -> None:
+    session_ids = [await create_session(f'user:{i}', payload=f'payload {i}') for i in range(10)]
+    batches = autopipeline.batches
+
+    results = await asyncio.gather(*(session_exists(session_id) for session_id in session_ids))
+    assert all(results)
+    assert autopipeline.batches == batches + 1
+
+    payloads = await asyncio.gather(
+        *(get_session_payload(session_id) for session_id in session_ids),
+        session_exists('user:0:inexistent'),
+    )
+    assert payloads == [f'payload {i}'.encode() for i in range(10)] + [False]
+    assert autopipeline.batches == batches + 2
+
+    await delete_session(*session_ids)
+
+
+async def test_autopipeline_errors(session_app: FastAPI) -> None:
+    await redis.set('autopipeline:string', 'abc')
+    # an error in one command doesn't affect the others
+    results = await asyncio.gather(
+        autopipeline.execute('LLEN', 'autopipeline:string'),
+        autopipeline.execute('GET', 'autopipeline:string'),
+        return_exceptions=True,
+    )
+    assert isinstance(results[0], ResponseError)
+    assert results[1] == b'abc'
+    with raises(ResponseError):
+        await autopipeline.execute('LLEN', 'autopipeline:string')
+    await redis.delete('autopipeline:string')
@@ -0,0 +1,102 @@
+import time
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from gitclub.authentication import user_cache
+from gitclub.cache import LRUCache, invalidate, on_invalidate
+from gitclub.models.user import get
+from gitclub.resources import redis
+from gitclub.sessions import (
+    create_csrf,
+    create_session_token,
+    delete_session,
+    revoked_prefixes,
+)
+
+from .utils import logged_session
+
+TestData = dict[str, dict[str, int]]
+
+
+def test_lru_cache() -> None:
+    cache: LRUCache[str, int] = LRUCache('test_lru', maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)  # evicts 'b', the least recently used
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+    assert cache.stats() == {'size': 2, 'maxsize': 2, 'hits': 2, 'misses': 1, 'evictions': 1}
+
+    cache.discard_if(lambda key, _: key == 'a')
+    assert cache.get('a') is None
+    cache.pop('c')
+    cache.pop('inexistent')
+    assert len(cache) == 0
+
+
+def test_lru_cache_ttl() -> None:
+    cache: LRUCache[str, int] = LRUCache('test_ttl', maxsize=2, ttl=60)
+    with patch('gitclub.cache.time.monotonic', return_value=0):
+        cache.set('a', 1)
+    with patch('gitclub.cache.time.monotonic', return_value=61):
+        assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+async def test_invalidate(session_app: FastAPI) -> None:
+    keys: list[str] = []
+    on_invalidate('test', keys.append)
+    await invalidate('test', 'user:1:abcd')
+    assert keys == ['user:1:abcd']
+
+
+async def test_authenticated_user_cache(test_dataset: TestData, client: AsyncClient) -> None:
+    john = test_dataset['users']['john']
+    url = f'/users/{john}'
+
+    await logged_session(client, john)
+    session_id = client.cookies['session_id']
+    resp = await client.get(url)
+    assert resp.status_code == 200
+    assert user_cache.get(session_id)
+
+    hits = user_cache.hits
+    resp = await client.get(url)
+    assert resp.status_code == 200
+    assert user_cache.hits == hits + 1
+
+    # logout evicts the cached session
+    await delete_session(session_id)
+    assert user_cache.get(session_id) is None
+    resp = await client.get(url)
+    assert resp.status_code == 401
+
+
+async def test_cached_session_checks(test_dataset: TestData, client: AsyncClient) -> None:
+    john = test_dataset['users']['john']
+    url = f'/users/{john}'
+    user = await get(john)
+    assert user
+
+    # a session token cached before it expired
+    session_id = create_session_token(f'user:{john}', lifetime=-1)
+    user_cache.set(session_id, user)
+    client.cookies['session_id'] = session_id
+    client.headers['x-csrf-token'] = create_csrf(session_id)
+    resp = await client.get(url)
+    assert resp.status_code == 401
+    assert user_cache.get(session_id) is None
+
+    # a session cached before its prefix was revoked, whose invalidation was lost
+    await logged_session(client, john)
+    session_id = client.cookies['session_id']
+    assert (await client.get(url)).status_code == 200
+    assert user_cache.get(session_id)
+    with patch.dict(revoked_prefixes, {f'user:{john}': time.time() * 1000}):
+        await redis.delete(session_id)
+        resp = await client.get(url)
+    assert resp.status_code == 401
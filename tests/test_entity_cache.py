@@ -0,0 +1,141 @@
+import asyncio
+from typing import Any
+from unittest.mock import patch
+
+import orjson
+from databases.interfaces import Record
+from fastapi import FastAPI
+
+from gitclub.autopipeline import autopipeline
+from gitclub.entity_cache import entity_caches
+from gitclub.metrics import collect
+from gitclub.models import issue, organization
+from gitclub.replicas import read_your_writes, use_replica
+from gitclub.resources import db, redis
+
+TestData = dict[str, dict[str, int]]
+
+
+async def forget(name: str, id_: int) -> None:
+    # not evict(), whose message comes back from Redis later and evicts the id again
+    entity_caches[name].local.clear()
+    await redis.delete(f'entity:{name}:{id_}')
+
+
+async def test_read_through(test_dataset: TestData) -> None:
+    beatles = test_dataset['organizations']['beatles']
+    cache = entity_caches['organization']
+    await forget('organization', beatles)
+
+    db_reads = cache.db_reads
+    org = await organization.get(beatles)
+    assert org and org.name == 'The Beatles'
+    assert cache.db_reads == db_reads + 1
+    # rows are shared as the array of their values
+    value = await redis.get(f'entity:organization:{beatles}')
+    assert value and orjson.loads(value) == [
+        org.name,
+        org.base_repo_role,
+        org.billing_address,
+        org.id,
+    ]
+
+    # from the local cache
+    assert await organization.get(beatles) is org
+    # from Redis, for a worker that doesn't have it yet
+    cache.local.clear()
+    redis_hits = cache.redis_hits
+    assert await organization.get(beatles) == org
+    assert cache.redis_hits == redis_hits + 1
+    assert cache.db_reads == db_reads + 1
+
+    # missing ids are not cached
+    assert await organization.get(-1) is None
+    assert await organization.get(-1) is None
+    assert cache.db_reads == db_reads + 3
+
+    stats = collect()['entity_caches']['organization']
+    assert 0 < stats['hit_ratio'] < 1
+    assert stats['evictions'] == cache.local.evictions
+
+
+async def test_stampede(test_dataset: TestData) -> None:
+    beatles = test_dataset['organizations']['beatles']
+    cache = entity_caches['organization']
+    await forget('organization', beatles)
+    db_reads = cache.db_reads
+    orgs = await asyncio.gather(*(organization.get(beatles) for _ in range(50)))
+    assert all(org and org.id == beatles for org in orgs)
+    assert cache.db_reads == db_reads + 1
+
+
+async def test_update(session_app: FastAPI, test_dataset: TestData) -> None:  # noqa: ARG001
+    acclaim = test_dataset['issues']['acclaim']
+    before = await issue.get(acclaim)
+    assert before
+    async with db.transaction(force_rollback=True):
+        await issue.update(acclaim, issue.IssuePatch(title='Uncommitted'))
+        # within the transaction, the cache is bypassed
+        after = await issue.get(acclaim)
+        assert after and after.title == 'Uncommitted'
+    # the uncommitted title was not cached
+    after = await issue.get(acclaim)
+    assert after and after.title == before.title
+
+
+async def test_replica_request(test_dataset: TestData) -> None:
+    beatles = test_dataset['organizations']['beatles']
+    cache = entity_caches['organization']
+    await forget('organization', beatles)
+    replica_reads = []
+
+    async def fetch_all(**values: Any) -> list[Record]:
+        replica_reads.append(use_replica())
+        return await fetch(**values)
+
+    fetch = cache.statement.fetch_all
+    with read_your_writes(), patch.object(cache.statement, 'fetch_all', fetch_all):
+        assert use_replica()
+        org = await organization.get(beatles)
+    # the rows cached are read from the primary
+    assert org and replica_reads == [False]
+    assert await redis.exists(f'entity:organization:{beatles}')
+
+
+async def test_redis_unavailable(test_dataset: TestData) -> None:
+    beatles = test_dataset['organizations']['beatles']
+    cache = entity_caches['organization']
+    await forget('organization', beatles)
+    db_reads = cache.db_reads
+    with (
+        patch.object(autopipeline, 'execute', side_effect=ConnectionError('down')),
+        patch.object(redis, 'evalsha') as evalsha,
+    ):
+        org = await organization.get(beatles)
+    assert org and org.id == beatles
+    assert cache.db_reads == db_reads + 1
+    evalsha.assert_not_called()
+
+
+async def test_eviction_by_another_worker(test_dataset: TestData) -> None:
+    beatles = test_dataset['organizations']['beatles']
+    cache = entity_caches['organization']
+    await forget('organization', beatles)
+
+    async def fetch_all(**values: Any) -> list[Record]:
+        rows = await fetch(**values)
+        # between the query and the write back, another worker updates and evicts the row,
+        # whose message hasn't reached this worker yet
+        with patch('gitclub.entity_cache.invalidate'):
+            await cache.evict(beatles)
+        return rows
+
+    fetch = cache.statement.fetch_all
+    with patch.object(cache.statement, 'fetch_all', fetch_all):
+        assert await organization.get(beatles)
+    assert not await redis.exists(f'entity:organization:{beatles}')
+
+    # rows read after the eviction are shared again
+    cache.local.clear()
+    assert await organization.get(beatles)
+    assert await redis.exists(f'entity:organization:{beatles}')
@@ -0,0 +1,72 @@
+from unittest.mock import patch
+
+import orjson
+from fastapi import FastAPI
+from pytest import raises
+
+from gitclub import config
+from gitclub.hashing import (
+    MIN_MEMORY_COST,
+    HashingBusyError,
+    HashingService,
+    calibrate,
+    calibrated_settings,
+    calibration_key,
+    hasher,
+    recalibrate,
+)
+from gitclub.resources import redis
+
+
+async def test_hashing_service(session_app: FastAPI) -> None:
+    password = 'valid password!!!'
+    password_hash = await hasher.hash(password)
+    assert await hasher.verify(password, password_hash)
+    assert not await hasher.verify('invalid password', password_hash)
+    stats = hasher.stats()
+    assert stats['queue_depth'] == 0
+    assert stats['completed'] >= 3
+
+
+async def test_hashing_service_without_workers() -> None:
+    service = HashingService(workers=0, queue_size=1)
+    service.start()
+    password_hash = await service.hash('valid password!!!')
+    assert await service.verify('valid password!!!', password_hash)
+    with raises(ValueError):
+        await service.verify('valid password!!!', 'not a hash')
+    service.stop()
+    stats = service.stats()
+    assert stats['completed'] == 2
+    assert stats['failed'] == 1
+
+
+async def test_hashing_service_busy() -> None:
+    service = HashingService(workers=0, queue_size=0)
+    with raises(HashingBusyError):
+        await service.hash('valid password!!!')
+    assert service.stats()['rejected'] == 1
+
+
+def test_calibrate() -> None:
+    settings = calibrate(target_ms=1000, max_memory_kib=1024)
+    assert settings['memory_cost'] == 1024
+    assert settings['time_cost'] > 1
+
+    # a single pass over 64 MiB takes longer than 1 ms
+    settings = calibrate(target_ms=1, max_memory_kib=65536)
+    assert MIN_MEMORY_COST <= settings['memory_cost'] < 65536
+    assert settings['time_cost'] >= 1
+
+
+async def test_calibrated_settings(session_app: FastAPI) -> None:
+    with patch.multiple(config, HASH_TARGET_MS=1, HASH_MAX_MEMORY_KIB=1024):
+        key = calibration_key()
+        await redis.delete(key)
+        settings = await calibrated_settings()
+        # kept until recalibrated
+        assert await redis.ttl(key) == -1
+        await redis.set(key, orjson.dumps({**settings, 'time_cost': 99}))
+        assert (await calibrated_settings())['time_cost'] == 99
+        assert await recalibrate() == await calibrated_settings()
+        await redis.delete(key)
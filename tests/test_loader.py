@@ -0,0 +1,60 @@
+import asyncio
+
+from fastapi import FastAPI
+
+from gitclub.loader import loaders
+from gitclub.models import repository, user
+from gitclub.resources import db
+from gitclub.statements import statements
+
+TestData = dict[str, dict[str, int]]
+
+
+async def test_batch(test_dataset: TestData) -> None:
+    ids = list(test_dataset['users'].values())
+    loader = loaders['user']
+    stmt = statements['user.get']
+    batches, shared, executions = loader.batches, loader.shared, stmt.executions
+
+    users = await asyncio.gather(*(user.get(id_) for id_ in [*ids, *ids, -1]))
+    assert [u.id if u else None for u in users] == [*ids, *ids, None]
+    # a single query, each id looked up once
+    assert loader.batches == batches + 1
+    assert stmt.executions == executions + 1
+    assert loader.shared == shared + len(ids)
+
+
+async def test_cancelled_lookup(test_dataset: TestData) -> None:
+    id_ = test_dataset['users']['john']
+    task = asyncio.create_task(user.get(id_))
+    other = asyncio.create_task(user.get(id_))
+    await asyncio.sleep(0)
+    task.cancel()
+    result = await other
+    assert result and result.id == id_
+
+
+async def test_organization_mismatch(test_dataset: TestData) -> None:
+    abbey_road = test_dataset['repositories']['abbey_road']
+    beatles = test_dataset['organizations']['beatles']
+    found, missing = await asyncio.gather(
+        repository.get(abbey_road, beatles), repository.get(abbey_road, beatles + 1)
+    )
+    assert found and found.id == abbey_road
+    assert missing is None
+
+
+async def test_transaction(session_app: FastAPI, test_dataset: TestData) -> None:  # noqa: ARG001
+    loader = loaders['user']
+    unbatched, batches = loader.unbatched, loader.batches
+    async with db.transaction(force_rollback=True):
+        id_ = await user.insert(
+            user.UserInsert(
+                name='Yoko', email='yoko@example.com', password='correct horse battery staple'
+            )
+        )
+        # the transaction reads its own writes
+        new_user = await user.get(id_)
+        assert new_user and new_user.name == 'Yoko'
+    assert loader.unbatched == unbatched + 1
+    assert loader.batches == batches
@@ -0,0 +1,16 @@
+from pytest import mark, raises
+
+from gitclub.pagination import decode_cursor, encode_cursor
+
+
+@mark.parametrize('key', [0, 1, -1, 2**31 - 1, -(2**31)])
+def test_cursor(key: int) -> None:
+    cursor = encode_cursor(key)
+    assert cursor.isascii() and '=' not in cursor
+    assert decode_cursor(cursor) == key
+
+
+@mark.parametrize('cursor', ['', 'not a cursor', encode_cursor(1)[:-1] + '!', 'YWJj'])
+def test_invalid_cursor(cursor: str) -> None:
+    with raises(ValueError):
+        decode_cursor(cursor)
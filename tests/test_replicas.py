@@ -0,0 +1,80 @@
+import time
+from unittest.mock import patch
+
+from httpx import AsyncClient
+from sqlalchemy.engine.url import make_url
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from gitclub import config
+from gitclub.replicas import (
+    COOKIE,
+    ReadYourWritesMiddleware,
+    read_your_writes,
+    record_write,
+    use_replica,
+)
+from gitclub.resources import PoolDatabase
+
+
+async def test_reader() -> None:
+    # the postgres database stands in for a replica of the test database
+    replica_url = str(make_url(config.DATABASE_URL).set(database='postgres'))
+    query = 'select current_database()'
+    with patch.object(config, 'DB_POOL_MIN_SIZE', 1):
+        database = PoolDatabase(config.DATABASE_URL, replica_urls=[replica_url])
+        await database.connect()
+        await database.replicas[0].connect()
+    try:
+        # outside of a request
+        assert await database.fetch_val(query) == config.DB_NAME
+
+        with read_your_writes():
+            assert await database.fetch_val(query) == 'postgres'
+            assert [row[0] async for row in database.iterate(query)] == ['postgres']
+            async with database.transaction():
+                assert await database.fetch_val(query) == config.DB_NAME
+            await database.execute('select 1')
+            assert await database.fetch_val(query) == config.DB_NAME
+
+        with read_your_writes(time.time() + 5):
+            row = await database.fetch_one(query)
+            assert row and row[0] == config.DB_NAME
+    finally:
+        await database.replicas[0].disconnect()
+        await database.disconnect()
+
+
+async def endpoint(request: Request) -> JSONResponse:
+    replica = use_replica()
+    if request.method == 'POST':
+        record_write()
+    return JSONResponse({'replica': replica})
+
+
+async def test_middleware() -> None:
+    app = Starlette(routes=[Route('/', endpoint, methods=['GET', 'POST'])])
+    app.add_middleware(ReadYourWritesMiddleware)
+    with patch.object(config, 'DATABASE_REPLICA_URLS', ['postgresql://replica']):
+        async with AsyncClient(app=app, base_url='https://testserver') as client:
+            resp = await client.get('/')
+            assert resp.json() == {'replica': True}
+            assert COOKIE not in resp.cookies
+
+            resp = await client.post('/')
+            primary_until = float(resp.cookies[COOKIE])
+            assert time.time() < primary_until <= time.time() + config.REPLICA_STICKINESS
+
+            # the client reads its writes
+            resp = await client.get('/')
+            assert resp.json() == {'replica': False}
+
+            # but can't pin itself to the primary for longer
+            client.cookies[COOKIE] = str(time.time() + 3600)
+            resp = await client.get('/')
+            assert resp.json() == {'replica': True}
+            client.cookies[COOKIE] = 'invalid'
+            resp = await client.get('/')
+            assert resp.json() == {'replica': True}
@@ -0,0 +1,37 @@
+from unittest.mock import patch
+
+from pytest import raises
+
+from gitclub import config
+from gitclub.resources import DatabaseBusyError, PoolBackend, PoolDatabase, db
+
+
+def test_pool_backend() -> None:
+    assert isinstance(db._backend, PoolBackend)
+    assert db._backend._pool
+    assert db._backend._pool.get_max_size() == config.DB_POOL_MAX_SIZE
+
+
+async def test_acquire_timeout() -> None:
+    with patch.multiple(config, DB_POOL_MIN_SIZE=1, DB_POOL_MAX_SIZE=1, DB_ACQUIRE_TIMEOUT=0.1):
+        database = PoolDatabase(config.DATABASE_URL)
+        backend = database._backend
+        assert isinstance(backend, PoolBackend)
+        await database.connect()
+        try:
+            # hold the only connection of the pool
+            connection = backend.connection()
+            await connection.acquire()
+            assert backend.stats()['in_use'] == 1
+            with raises(DatabaseBusyError):
+                await database.fetch_val('select 1')
+            await connection.release()
+            assert await database.fetch_val('select 1') == 1
+        finally:
+            await database.disconnect()
+
+    stats = backend.stats()
+    assert stats['timeouts'] == 1
+    assert stats['acquisitions'] == 2
+    assert stats['waiting'] == stats['in_use'] == 0
+    assert stats['wait_p99_ms'] >= 100
@@ -0,0 +1,26 @@
+import orjson
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+from gitclub.models.user_organization import OrganizationMemberInfo
+from gitclub.responses import trusted_json
+
+
+def test_trusted_json() -> None:
+    members = [
+        OrganizationMemberInfo.construct(id=i, name=f'user {i}', email=f'u{i}@a.com', role='member')
+        for i in range(3)
+    ]
+    resp = trusted_json({'members': members})
+    assert resp.status_code == 200
+    assert resp.media_type == 'application/json'
+    assert orjson.loads(resp.body) == jsonable_encoder({'members': members})
+
+    # status code and headers set by the handler are kept
+    injected = Response()
+    injected.status_code = 201
+    injected.headers['Link'] = '</next>; rel="next"'
+    resp = trusted_json(members, injected)
+    assert resp.status_code == 201
+    assert resp.headers['Link'] == '</next>; rel="next"'
+    assert resp.headers['content-length'] == str(len(resp.body))
@@ -0,0 +1,156 @@
+from unittest.mock import patch
+
+from gitclub.authorization import authorized, role_memo
+from gitclub.autopipeline import autopipeline
+from gitclub.models import repository, user
+from gitclub.models.user_organization import update_user_organization
+from gitclub.models.user_repository import UserRepositoryInfo, delete_user_repository, insert
+from gitclub.resources import db, redis
+from gitclub.role_cache import MISSING, Stamp, invalidate_role, role_cache
+
+TestData = dict[str, dict[str, int]]
+
+
+async def current_stamp(kind: str, user_id: int, resource_ids: list[int]) -> Stamp:
+    # with the current generation, which the invalidations of earlier tests
+    # coming back from Redis might have moved since get_many
+    _, (_, version) = await role_cache.get_many(kind, user_id, resource_ids)
+    return role_cache.generation, version
+
+
+async def test_role_cache(test_dataset: TestData) -> None:
+    ringo = await user.get(test_dataset['users']['ringo'])
+    abbey_road = await repository.get(test_dataset['repositories']['abbey_road'])
+    assert ringo and abbey_road
+    role_cache.local.clear()
+
+    # ringo has no role in abbey_road, but is a member of the beatles
+    with role_memo() as memo:
+        assert await authorized(ringo, 'read', abbey_road)
+        assert memo.queries == 1
+
+    # steady state: no queries at all
+    with role_memo() as memo:
+        assert await authorized(ringo, 'read', abbey_road)
+        assert not await authorized(ringo, 'create_role_assignments', abbey_road)
+        assert memo.queries == 0
+
+    # role assignments evict the cached roles
+    # (outside of a transaction, so the changes are undone at the end)
+    await insert(UserRepositoryInfo(user_id=ringo.id, repository_id=abbey_road.id, role='admin'))
+    with role_memo() as memo:
+        assert await authorized(ringo, 'create_role_assignments', abbey_road)
+        assert memo.queries == 1
+
+    await delete_user_repository(ringo.id, abbey_road.id)
+    assert not await authorized(ringo, 'create_role_assignments', abbey_road)
+
+    # the role in the organization is part of the cached repository roles
+    await update_user_organization(ringo.id, abbey_road.organization_id, 'owner')
+    try:
+        assert await authorized(ringo, 'create_role_assignments', abbey_road)
+    finally:
+        await update_user_organization(ringo.id, abbey_road.organization_id, 'member')
+
+
+async def test_role_invalidation_after_commit(test_dataset: TestData) -> None:
+    paul = test_dataset['users']['paul']
+    beatles = test_dataset['organizations']['beatles']
+    role_cache.local.clear()
+    with patch('gitclub.role_cache.invalidate') as invalidate:
+        async with db.transaction():
+            await invalidate_role('organization', paul, beatles)
+            async with db.transaction():
+                await invalidate_role('organization', paul, beatles)
+            invalidate.assert_not_called()
+
+            # roles are neither cached nor read from the cache within a transaction
+            _, stamp = await role_cache.get_many('organization', paul, [beatles])
+            await role_cache.set_many('organization', paul, {beatles: 'member'}, stamp)
+            assert role_cache.local.get(('organization', paul, beatles), MISSING) is MISSING
+        assert invalidate.await_count == 2
+
+        # invalidations of a transaction that rolls back are dropped
+        async with db.transaction(force_rollback=True):
+            await invalidate_role('organization', paul, beatles)
+        assert invalidate.await_count == 2
+
+
+async def test_role_cache_invalidation_during_request(test_dataset: TestData) -> None:
+    paul = test_dataset['users']['paul']
+    beatles = test_dataset['organizations']['beatles']
+    _, stamp = await role_cache.get_many('organization', paul, [beatles])
+    generation = role_cache.generation
+    with role_memo() as memo:
+        memo.roles['organization', paul, beatles] = 'member'
+        await invalidate_role('organization', paul, beatles)
+        assert memo.roles == {}
+    assert role_cache.generation == generation + 1
+
+    # roles read before the invalidation are not cached
+    await role_cache.set_many('organization', paul, {beatles: 'member'}, stamp)
+    assert (await role_cache.get_many('organization', paul, [beatles]))[0] == {}
+
+
+async def test_shared_role_cache() -> None:
+    user_id = 1_234
+    with patch.object(role_cache, 'shared', True):
+        stamp = await current_stamp('repository', user_id, [1, 2])
+        await role_cache.set_many(
+            'repository', user_id, {1: ('admin', None), 2: (None, None)}, stamp
+        )
+        stamp = await current_stamp('organization', user_id, [3])
+        await role_cache.set_many('organization', user_id, {3: 'owner'}, stamp)
+        role_cache.local.clear()
+
+        # found in Redis, like another worker would
+        roles, _ = await role_cache.get_many('repository', user_id, [1, 2, 4])
+        assert roles == {1: ('admin', None), 2: (None, None)}
+        assert role_cache.local.get(('repository', user_id, 1), MISSING) == ('admin', None)
+
+        await invalidate_role('repository', user_id, 1)
+        assert await redis.hkeys(f'roles:{user_id}') == [b'repository:2', b'organization:3']
+
+        # the repository roles depend on the organization role
+        await invalidate_role('organization', user_id, 3)
+        assert not await redis.exists(f'roles:{user_id}')
+        assert (await role_cache.get_many('repository', user_id, [2]))[0] == {}
+
+
+async def test_invalidation_by_another_worker() -> None:
+    user_id = 2_345
+    with patch.object(role_cache, 'shared', True):
+        roles, stamp = await role_cache.get_many('organization', user_id, [1])
+        assert roles == {}
+        # between the query and the write back, another worker invalidates the role,
+        # whose message hasn't reached this worker yet
+        with patch('gitclub.role_cache.invalidate'):
+            await invalidate_role('organization', user_id, 1)
+        await role_cache.set_many('organization', user_id, {1: 'owner'}, stamp)
+        assert not await redis.exists(f'roles:{user_id}')
+
+        # roles read after the invalidation are shared again
+        role_cache.local.clear()
+        stamp = await current_stamp('organization', user_id, [1])
+        await role_cache.set_many('organization', user_id, {1: 'member'}, stamp)
+        assert await redis.hget(f'roles:{user_id}', 'organization:1') == b'"member"'
+        await invalidate_role('organization', user_id, 1)
+
+
+async def test_redis_unavailable(test_dataset: TestData) -> None:
+    ringo = await user.get(test_dataset['users']['ringo'])
+    abbey_road = await repository.get(test_dataset['repositories']['abbey_road'])
+    assert ringo and abbey_road
+    role_cache.local.clear()
+    with (
+        patch.object(role_cache, 'shared', True),
+        patch.object(autopipeline, 'execute', side_effect=ConnectionError('down')),
+        patch.object(redis, 'evalsha', side_effect=ConnectionError('down')),
+    ):
+        # from the database, then from the local cache
+        with role_memo() as memo:
+            assert await authorized(ringo, 'read', abbey_road)
+            assert memo.queries == 1
+        with role_memo() as memo:
+            assert await authorized(ringo, 'read', abbey_road)
+            assert memo.queries == 0
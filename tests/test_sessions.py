@@ -0,0 +1,149 @@
+import asyncio
+from unittest.mock import patch
+
+from fastapi import FastAPI
+
+from gitclub import config
+from gitclub.resources import redis
+from gitclub.sessions import (
+    DENYLIST,
+    create_session,
+    create_session_token,
+    delete_session,
+    denied_tokens,
+    flush_refreshes,
+    is_session_id,
+    is_session_token,
+    list_sessions,
+    migrate_revocations,
+    pending_refreshes,
+    refreshed_sessions,
+    revoke_sessions,
+    revoked_prefixes,
+    session_exists,
+    session_index,
+    session_prefix,
+    sync_denylist,
+    touch_session,
+)
+
+
+async def test_session_store(session_app: FastAPI) -> None:
+    prefix = 'user:1234'
+    first = await create_session(prefix)
+    second = await create_session(prefix)
+    other = await create_session('user:5678')
+
+    assert await session_exists(first)
+    assert await session_exists(second)
+    assert set(await list_sessions(prefix)) == {first, second}
+
+    await delete_session(first)
+    assert not await session_exists(first)
+    assert await list_sessions(prefix) == [second]
+
+    assert await revoke_sessions(prefix) == 1
+    assert not await session_exists(second)
+    assert await list_sessions(prefix) == []
+    assert await revoke_sessions(prefix) == 0
+
+    # sessions of other prefixes are not affected
+    assert await session_exists(other)
+    await delete_session(other)
+
+
+async def test_revoke_while_creating(session_app: FastAPI) -> None:  # noqa: ARG001
+    prefix = 'user:2345'
+    created = await asyncio.gather(*(create_session(prefix) for _ in range(20)))
+    results = await asyncio.gather(
+        *(create_session(prefix) for _ in range(20)), revoke_sessions(prefix)
+    )
+    # every session created before the revocation is deleted, the others are indexed
+    for session_id in created + results[:-1]:
+        assert not await session_exists(session_id) or session_id in await list_sessions(prefix)
+    assert not any([await session_exists(session_id) for session_id in created])
+    await revoke_sessions(prefix)
+
+
+async def test_session_tokens(session_app: FastAPI) -> None:
+    prefix = 'user:4321'
+    with patch.object(config, 'STATELESS_SESSIONS', True):
+        first = await create_session(prefix)
+        second = await create_session(prefix)
+        with_payload = await create_session(prefix, payload='data')
+
+    assert is_session_token(first) and is_session_token(second)
+    assert session_prefix(first) == prefix
+    assert not is_session_token(with_payload)  # payloads must still be stored in Redis
+
+    # valid tokens don't need Redis
+    with patch.object(redis, 'exists', side_effect=AssertionError):
+        assert await session_exists(first)
+        assert await session_exists(second)
+
+    # tampered or expired tokens
+    assert not await session_exists(first[:-1] + ('A' if first[-1] != 'A' else 'B'))
+    assert not await session_exists(first.replace(prefix, 'user:1'))
+    assert not await session_exists(create_session_token(prefix, lifetime=-1))
+
+    # revoked tokens
+    await delete_session(first)
+    assert not await session_exists(first)
+    assert await session_exists(second)
+
+    # the denylist is rebuilt from Redis
+    denied_tokens.clear()
+    await sync_denylist()
+    assert not await session_exists(first)
+
+    await revoke_sessions(prefix)
+    assert not await session_exists(second)
+    assert not await session_exists(with_payload)
+    revoked_prefixes.clear()
+    await sync_denylist()
+    assert not await session_exists(second)
+
+
+async def test_sliding_expiration(session_app: FastAPI) -> None:
+    session_id = await create_session('user:2468', lifetime=100)
+    assert await redis.ttl(session_id) <= 100
+
+    # recently created sessions are not renewed
+    touch_session(session_id)
+    assert session_id not in pending_refreshes
+
+    await redis.expire(session_id, 10)
+    refreshed_sessions.pop(session_id)
+    touch_session(session_id)
+    touch_session(session_id)  # renewed only once
+    assert pending_refreshes == {session_id}
+    await flush_refreshes()
+    assert not pending_refreshes
+    # renewed by its own lifetime
+    assert 10 < await redis.ttl(session_id) <= 100
+    assert await list_sessions('user:2468') == [session_id]
+    await delete_session(session_id)
+
+
+async def test_delete_forged_session(session_app: FastAPI) -> None:
+    session_id = await create_session('user:1357')
+    with patch.object(config, 'STATELESS_SESSIONS', True):
+        token = await create_session('user:1357')
+    await delete_session(token)
+    assert await redis.exists(DENYLIST)
+
+    # keys that are not sessions are left alone
+    for key in (DENYLIST, session_index('user:1357'), 'roles:1357', token[:-1] + '.'):
+        assert not is_session_id(key)
+    await delete_session(DENYLIST, session_index('user:1357'))
+    assert await redis.exists(DENYLIST)
+    assert await list_sessions('user:1357') == [session_id]
+    await delete_session(session_id)
+
+
+async def test_migrate_revocations(session_app: FastAPI) -> None:
+    await redis.zadd('sessions:denylist', {'user:1:legacy.token': 2**40})
+    await migrate_revocations()
+    assert not await redis.exists('sessions:denylist')
+    assert await redis.zscore(DENYLIST, 'user:1:legacy.token') == 2**40
+    await redis.zrem(DENYLIST, 'user:1:legacy.token')
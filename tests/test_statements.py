@@ -0,0 +1,56 @@
+import asyncio
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from pytest import raises
+from sqlalchemy import bindparam, literal_column, select
+
+from gitclub import config
+from gitclub.metrics import collect
+from gitclub.models import user
+from gitclub.resources import PoolDatabase
+from gitclub.statements import Statement, statement, statements
+
+TestData = dict[str, dict[str, int]]
+
+
+def test_statement() -> None:
+    stmt = statements['user_repository.get_role']
+    assert stmt.params == ['repository_id', 'user_id']
+    assert '$1' in stmt.sql and '$2' in stmt.sql and ':' not in stmt.sql
+
+    with raises(ValueError, match='already registered'):
+        statement('user.get', select(user.User).where(user.User.c.id == bindparam('user_id')))
+
+
+async def test_concurrent_executions(app: FastAPI, test_dataset: TestData) -> None:  # noqa: ARG001
+    # the tests share a single connection, like the tasks of a transaction do
+    ids = list(test_dataset['users'].values())
+    stmt = statements['user.get']
+    executions = stmt.executions
+    users = await asyncio.gather(*(user.get(id_) for id_ in ids * 10))
+    assert [u.id for u in users if u] == ids * 10
+    assert stmt.executions == executions + len(ids) * 10
+
+    stats = collect()['statements']
+    assert stats['statements']['user.get']['executions'] == stmt.executions
+    assert stats['compile_ms_saved'] > 0
+    assert stats['parse_ms_saved'] > 0
+
+
+async def test_statement_cache_disabled() -> None:
+    stmt = Statement('no_cache', select(literal_column('1')))
+    with patch.multiple(config, DB_POOL_MIN_SIZE=1, DB_STATEMENT_CACHE_SIZE=0):
+        database = PoolDatabase(config.DATABASE_URL)
+        await database.connect()
+    try:
+        with patch('gitclub.statements.db', database):
+            for _ in range(3):
+                assert await stmt.fetch_val() == 1
+    finally:
+        await database.disconnect()
+    # the server parses the statement on every execution
+    stats = stmt.stats()
+    assert stats['executions'] == 3
+    assert stats['compile_ms_saved'] > 0
+    assert stats['parse_ms_saved'] == 0
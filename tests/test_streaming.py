@@ -0,0 +1,32 @@
+from collections.abc import AsyncIterator, Mapping, Sequence
+from typing import Any
+from unittest.mock import patch
+
+import orjson
+
+from gitclub import config
+from gitclub.streaming import encode_rows
+
+
+async def aiter_rows(rows: Sequence[Mapping[str, Any]]) -> AsyncIterator[Mapping[str, Any]]:
+    for row in rows:
+        yield row
+
+
+async def encoded_chunks(rows: Sequence[Mapping[str, Any]]) -> list[bytes]:
+    return [chunk async for chunk in encode_rows(aiter_rows(rows), ['id', 'name'])]
+
+
+async def test_encode_rows() -> None:
+    assert await encoded_chunks([]) == [b'[]']
+
+    rows = [{'id': i, 'name': f'user {i}', 'password_hash': 'secret'} for i in range(100)]
+    chunks = await encoded_chunks(rows)
+    assert len(chunks) == 1
+    assert orjson.loads(b''.join(chunks)) == [{'id': r['id'], 'name': r['name']} for r in rows]
+
+    with patch.object(config, 'STREAM_CHUNK_SIZE', 100):
+        chunks = await encoded_chunks(rows)
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 100 for chunk in chunks[:-1])
+    assert orjson.loads(b''.join(chunks)) == [{'id': r['id'], 'name': r['name']} for r in rows]